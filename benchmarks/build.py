@@ -0,0 +1,130 @@
+"""Time Halcyon builds of a synthetic site.
+
+Each measurement runs in a fresh Python process so that its peak memory can
+be recorded, with the number of pages written.  Four builds are measured:
+* cold --- empty output directory and caches,
+* warm --- nothing changed since the previous build,
+* edit --- one content file changed since the previous build,
+* undated --- one undated page's content file changed, so its date, from the
+  file's modification time, changed too.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sitegen
+
+
+def child(directory, jobs, low_memory):
+    """Build the site in directory and print time, peak RSS and the number of
+    pages written as JSON"""
+    import resource
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.chdir(directory)
+    start = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        from halcyon.halcyon import Halcyon
+        Halcyon(jobs=jobs, low_memory=low_memory)()
+    elapsed = time.perf_counter() - start
+    written = re.search(r'^Pages: (\d+) written', output.getvalue(), re.MULTILINE)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        maxrss *= 1024
+    print(json.dumps(dict(seconds=elapsed, peak_rss=maxrss,
+                          written=int(written.group(1)) if written else None)))
+
+
+def measure(directory, jobs, low_memory=False):
+    command = [sys.executable, os.path.abspath(__file__),
+               '--child', directory, '--jobs', str(jobs)]
+    if low_memory:
+        command.append('--low-memory')
+    output = subprocess.check_output(command)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def edit(directory, subdirectory='content'):
+    """Append a paragraph to the first content file in subdirectory"""
+    for root, dirs, files in os.walk(os.path.join(directory, subdirectory)):
+        dirs.sort()
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'a') as stream:
+                stream.write('\nEdited at {}.\n'.format(time.time()))
+            return
+
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix='halcyon-bench-')
+    try:
+        sitegen.generate(directory, args.pages, args.sections, args.depth,
+                         args.partials, args.assets, args.seed)
+        results = dict(pages=args.pages, jobs=args.jobs, low_memory=args.low_memory,
+                       builds={})
+        for repeat in range(args.repeat):
+            for name in ('cold', 'warm', 'edit', 'undated'):
+                if name == 'cold':
+                    for item in ('html', '.halcyon-cache'):
+                        shutil.rmtree(os.path.join(directory, item), ignore_errors=True)
+                elif name == 'edit':
+                    edit(directory)
+                elif name == 'undated':
+                    edit(directory, 'undated')
+                result = measure(directory, args.jobs, args.low_memory)
+                best = results['builds'].get(name)
+                if best is None or result['seconds'] < best['seconds']:
+                    results['builds'][name] = result
+    finally:
+        if args.keep:
+            print('Site kept in {}'.format(directory), file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--sections', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--partials', type=int, default=20)
+    parser.add_argument('--assets', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--low-memory', action='store_true',
+                        help='build with Halcyon(low_memory=True)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='report the best of this many runs')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the generated site')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also write results as JSON to FILE')
+    parser.add_argument('--child', metavar='DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.jobs, args.low_memory)
+        return
+
+    results = run(args)
+    print('{:8} {:>10} {:>12} {:>8}'.format('build', 'seconds', 'peak MiB', 'written'))
+    for name, result in results['builds'].items():
+        print('{:8} {:10.3f} {:12.1f} {:>8}'.format(name, result['seconds'],
+                                                    result['peak_rss'] / (1024 * 1024),
+                                                    result['written']))
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+
+if __name__ == '__main__':
+    main()
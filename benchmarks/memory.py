@@ -0,0 +1,111 @@
+"""Measure the memory held per page by a Halcyon build of a synthetic site.
+
+Each measurement runs in a fresh Python process.  Memory allocated by the
+sitemap, pages and content is traced with tracemalloc after the pages are
+configured and again after they are rendered, and reported per page along
+with the size of a single Page and its Content.  Use --source to measure
+another Halcyon source tree, e.g. a git worktree of an earlier revision, and
+compare the results.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+import subprocess
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sitegen
+
+
+def _sizeof(obj):
+    """Size of obj and its instance attributes, not counting shared values"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def child(directory, source, low_memory):
+    """Build the site in directory and print memory use as JSON"""
+    import tracemalloc
+    sys.path.insert(0, source)
+    os.chdir(directory)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        from halcyon.halcyon import Halcyon
+        from halcyon.content import Content
+        kwargs = dict(low_memory=True) if low_memory else {}
+        prog = Halcyon(**kwargs)
+        tracemalloc.start()
+        prog.read_sitemap('sitemap.yml')
+        prog.fixup_config()
+        configured = tracemalloc.get_traced_memory()[0]
+        prog.copy_assets()
+        prog.render_pages()
+        rendered = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    pages = [page for page in prog._render_pages
+                  if isinstance(getattr(page, '_content', None), Content)]
+    page = pages[0]
+    print(json.dumps(dict(pages=len(prog._render_pages),
+                          configured=configured / len(prog._render_pages),
+                          rendered=rendered / len(prog._render_pages),
+                          page=_sizeof(page),
+                          content=_sizeof(page._content))))
+
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix='halcyon-bench-')
+    source = os.path.abspath(args.source)
+    try:
+        sitegen.generate(directory, args.pages, args.sections, args.depth,
+                         args.partials, assets=0, seed=args.seed)
+        command = [sys.executable, os.path.abspath(__file__),
+                   '--child', directory, '--source', source]
+        if args.low_memory:
+            command.append('--low-memory')
+        # first build fills the caches, the second is measured
+        subprocess.check_output(command)
+        output = subprocess.check_output(command)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--sections', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--partials', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', default=os.path.dirname(os.path.dirname(
+                                                 os.path.abspath(__file__))),
+                        help='Halcyon source tree to measure (default this one)')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='build with Halcyon(low_memory=True)')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also write results as JSON to FILE')
+    parser.add_argument('--child', metavar='DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, os.path.abspath(args.source), args.low_memory)
+        return
+
+    results = run(args)
+    print('{:24} {:>10}'.format('bytes per page', ''))
+    print('{:24} {:10.0f}'.format('after configure', results['configured']))
+    print('{:24} {:10.0f}'.format('after render', results['rendered']))
+    print('{:24} {:10d}'.format('Page object', results['page']))
+    print('{:24} {:10d}'.format('Content object', results['content']))
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+
+if __name__ == '__main__':
+    main()
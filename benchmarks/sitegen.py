@@ -0,0 +1,139 @@
+"""Generate a synthetic Halcyon site for benchmarking.
+
+The site has Markdown pages with frontmatter in nested directories found by
+several !search tags, undated pages listed in the sitemap whose date is the
+file's modification time, a !config directory, a theme whose layouts extend and
+include each other, SCSS partials imported by an entry point and a tree of
+binary assets.
+"""
+import os
+import random
+
+_words = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+          'tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam '
+          'quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo').split()
+
+
+def _write(path, text, mode='w'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as stream:
+        stream.write(text)
+
+
+def _sentence(rng, length=12):
+    return ' '.join(rng.choice(_words) for _ in range(length)).capitalize() + '.'
+
+
+def page(rng, number, dated=True):
+    """Markdown text with frontmatter for page number, without a date unless
+    dated"""
+    tags = sorted(set(rng.choice(_words) for _ in range(3)))
+    paragraphs = '\n\n'.join(_sentence(rng, rng.randint(20, 60))
+                             for _ in range(rng.randint(3, 8)))
+    sections = '\n\n'.join('## Section {}\n\n{}\n\n```\ncode block {}\n```'
+                           .format(item, _sentence(rng), item)
+                           for item in range(rng.randint(1, 4)))
+    date = 'date: 2020-{:02d}-{:02d}\n'.format(number % 12 + 1, number % 28 + 1)
+    return ('---\ntitle: Page {number}\n{date}'
+            'layout: {layout}\ntags: [{tags}]\n---\n# Page {number}\n\n{paragraphs}\n\n'
+            '* [first](/index.html)\n* *emphasis* and `code`\n\n{sections}\n'
+            .format(number=number, date=date if dated else '',
+                    layout=('default', 'post')[number % 2], tags=', '.join(tags),
+                    paragraphs=paragraphs, sections=sections))
+
+
+def generate(directory, pages=1000, sections=4, depth=2, partials=20,
+             assets=200, seed=0, undated=10):
+    """Create a site in directory.  Pages are spread over sections, each a
+    tree of the given depth found by its own !search tag.  A further undated
+    pages are in the `undated` directory, each listed in the sitemap."""
+    rng = random.Random(seed)
+
+    # content
+    for number in range(pages):
+        section = number % sections
+        nested = ['d{}'.format(number // sections // 10 ** level % 10)
+                  for level in range(depth)]
+        path = os.path.join(directory, 'content', 'section{}'.format(section),
+                            *nested, 'page{}.md'.format(number))
+        _write(path, page(rng, number))
+
+    entries = ''
+    for number in range(undated):
+        path = os.path.join('undated', 'page{}.md'.format(number))
+        _write(os.path.join(directory, path), page(rng, pages + number, dated=False))
+        entries += ('  - !page\n    path: {}\n    content: {}\n'
+                    .format(path.replace('.md', '.html'), path))
+
+    searches = '\n'.join('  section{0}: !search content/section{0}'.format(section)
+                         for section in range(sections))
+    _write(os.path.join(directory, 'sitemap.yml'),
+           'title: Benchmark site\ntheme: bench\n'
+           'halcyon:\n  theme_path: ./themes\n  output_dir: ./html\n'
+           'data: !config data\n'
+           'sections:\n{searches}\n'
+           'pages:\n  - !page\n    path: index.html\n    layout: index\n'
+           '    content: !markdown "Synthetic *benchmark* site"\n{entries}'
+           .format(searches=searches, entries=entries))
+    _write(os.path.join(directory, 'data', 'menu.yml'),
+           ''.join('- {{title: Section {0}, url: /section{0}/}}\n'.format(section)
+                   for section in range(sections)))
+
+    # theme with layout inheritance and includes
+    layouts = os.path.join(directory, 'themes', 'bench', '_layouts')
+    include = os.path.join(directory, 'themes', 'bench', 'include')
+    _write(os.path.join(layouts, 'base.html'),
+           '<!DOCTYPE html>\n<html><head><title>{{ title }}</title>'
+           '<link rel="stylesheet" href="/css/main.css"></head>\n<body>\n'
+           '{% include "menu.html" %}\n{% block body %}{% endblock %}\n'
+           '{% include "footer.html" %}\n</body></html>\n')
+    _write(os.path.join(layouts, 'default.html'),
+           '{% extends "base.html" %}\n{% block body %}<article>\n'
+           '<h1>{{ title }}</h1><p>{{ date | date }}</p>\n'
+           '{% block article %}{{ content }}{% endblock %}\n</article>{% endblock %}\n')
+    _write(os.path.join(layouts, 'post.html'),
+           '{% extends "default.html" %}\n{% block article %}\n'
+           '<ul>{% for item in content.toc() %}<li>{{ item }}</li>{% endfor %}</ul>\n'
+           '{{ super() }}\n{% endblock %}\n')
+    _write(os.path.join(layouts, 'index.html'),
+           '{% extends "base.html" %}\n{% block body %}{{ content }}\n'
+           '{% for name, pages in sections.items() %}<h2>{{ name }}</h2><ul>\n'
+           '{% for page in pages[:20] %}<li><a href="{{ page.url }}">{{ page.title }}</a>'
+           '</li>{% endfor %}</ul>{% endfor %}{% endblock %}\n')
+    _write(os.path.join(include, 'menu.html'),
+           '<nav>{% for item in data.menu %}<a href="{{ item.url }}">{{ item.title }}</a>'
+           '{% endfor %}</nav>\n')
+    _write(os.path.join(include, 'footer.html'),
+           '<footer>{{ halcyon.pages | length }} pages</footer>\n')
+
+    # sass partials imported by an entry point
+    sass = os.path.join(directory, 'themes', 'bench', 'sass')
+    for number in range(partials):
+        _write(os.path.join(sass, '_part{}.scss'.format(number)),
+               '$color{0}: #{1:06x};\n@mixin mix{0} {{ color: $color{0}; }}\n'
+               '.class{0} {{ @include mix{0}; margin: {0}px; }}\n'
+               .format(number, rng.randrange(0x1000000)))
+    _write(os.path.join(directory, 'themes', 'bench', 'assets', 'css', 'main.scss'),
+           ''.join('@import "part{}";\n'.format(number) for number in range(partials)))
+
+    # binary assets
+    for number in range(assets):
+        path = os.path.join(directory, 'assets', 'images', 'dir{}'.format(number % 10),
+                            'image{}.bin'.format(number))
+        _write(path, bytes(rng.getrandbits(8) for _ in range(rng.randint(256, 4096))), 'wb')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory')
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--sections', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--partials', type=int, default=20)
+    parser.add_argument('--assets', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--undated', type=int, default=10)
+    args = parser.parse_args()
+    generate(args.directory, args.pages, args.sections, args.depth,
+             args.partials, args.assets, args.seed, args.undated)
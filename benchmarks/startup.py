@@ -0,0 +1,81 @@
+"""Check Halcyon's command line start up time against a budget.
+
+The time to import the command line entry point and construct Halcyon() is
+measured in fresh Python processes, less the time to start Python itself, and
+the best of several runs compared with the budget.  Heavy dependencies which
+should only be loaded when first used must not have been imported by then.
+Exits with status 1 if either check fails, so it may be run in CI.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# modules which must not be loaded until needed
+LAZY = ('sass', 'hycmark', 'jinja2', 'yaml', 'multiprocessing',
+        'concurrent.futures', 'http.server', 'shutil', 'traceback', 'configparser')
+
+_probe = '''
+import sys, json
+from halcyon.__main__ import run
+from halcyon.halcyon import Halcyon
+Halcyon()
+print(json.dumps([name for name in {lazy!r} if name in sys.modules]))
+'''
+
+
+def _elapsed(command, env):
+    start = time.perf_counter()
+    subprocess.check_call(command, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run(args):
+    env = dict(os.environ)
+    source = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [source, env.get('PYTHONPATH')]))
+
+    probe = _probe.format(lazy=LAZY)
+    output = subprocess.check_output([sys.executable, '-c', probe], env=env)
+    loaded = json.loads(output.decode().splitlines()[-1])
+
+    baseline = min(_elapsed([sys.executable, '-c', 'pass'], env)
+                   for _ in range(args.repeat))
+    startup = min(_elapsed([sys.executable, '-c', probe], env)
+                  for _ in range(args.repeat))
+    return dict(baseline=baseline, startup=startup, imports=startup - baseline,
+                budget=args.budget / 1000, loaded=loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--budget', type=float, default=60, metavar='MS',
+                        help='import time budget in milliseconds (default 60)')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='report the best of this many runs')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also write results as JSON to FILE')
+    args = parser.parse_args()
+
+    results = run(args)
+    print('{:24} {:10.1f} ms'.format('python start up', results['baseline'] * 1000))
+    print('{:24} {:10.1f} ms'.format('halcyon imports', results['imports'] * 1000))
+    print('{:24} {:10.1f} ms'.format('budget', results['budget'] * 1000))
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    failed = False
+    if results['loaded']:
+        print('Loaded eagerly: {}'.format(', '.join(results['loaded'])))
+        failed = True
+    if results['imports'] > results['budget']:
+        print('Over budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,45 @@
+import argparse
+import functools
 from .halcyon import Halcyon
 
 def run():  # pragma: no cover
     """Run Halcyon from the command line."""
-    prog = Halcyon()
-    prog()
+    parser = argparse.ArgumentParser(prog='halcyon',
+                                     description='Static website builder.')
+    parser.add_argument('sitemap', nargs='?', default=None,
+                        help='site map (default sitemap.yml)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='render all pages ignoring the build manifest')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help='render pages using N processes (0 for one per CPU)')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='rebuild the site when source files change')
+    parser.add_argument('-s', '--serve', action='store_true',
+                        help='serve the site over HTTP and rebuild on changes')
+    parser.add_argument('--bind', default='127.0.0.1',
+                        help='address for --serve (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='port for --serve (default 8000)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write build timings as JSON to FILE (- for stdout)')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='release page content once rendered to bound memory use')
+    parser.add_argument('--compile-templates', action='store_true',
+                        help='compile site and theme templates into the cache and exit')
+    args = parser.parse_args()
+
+    factory = functools.partial(Halcyon, force=args.force, jobs=args.jobs,
+                                profile=args.profile, low_memory=args.low_memory)
+    if args.compile_templates:
+        prog = factory()
+        prog.compile_templates(args.sitemap)
+    elif args.watch or args.serve:
+        from .watch import watch
+        server = (args.bind, args.port) if args.serve else None
+        watch(factory, args.sitemap, server)
+    else:
+        prog = factory()
+        prog(args.sitemap)
 
 
 if __name__ == '__main__':  # pragma: no cover
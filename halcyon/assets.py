@@ -0,0 +1,267 @@
+import os
+import errno
+from .utils import digest, file_digest, write_if_changed
+
+# Linux ioctl to share a file's extents with another (reflink)
+FICLONE = 0x40049409
+
+
+class AssetSync(object):
+    """
+# AssetSync(output_dir, records, method, filterdir, filterfile, force, jobs,
+#           transform, fingerprint)
+
+Copy asset trees to output_dir.  Trees are scanned with os.scandir() and a
+file is copied only if its size or modification time differ from those
+recorded when it was last copied, or the file written for it is missing.
+Copies run on a pool of up to jobs threads.  If the same destination is found
+in more than one tree, the first found is used.
+
+`records` is the mapping of destination to source, size and modification
+time from the previous build (usually a manifest entry) and `method` one of:
+* `copy` --- Copy data and metadata.
+* `hardlink` --- Hard link to the source, copying if that is not possible.
+* `reflink` --- Share the source's data blocks where the filesystem supports
+  it (Btrfs, XFS), copying otherwise.
+
+filterdir(root, name, entry) and filterfile(name) return True for directories
+and files to ignore, entry is the directory's os.scandir() entry.  Sass and
+SCSS files are not copied but returned by `scan()` for compilation.  If force
+is True every file is copied.
+
+transform(destination) returns None to copy a file unchanged, or a function
+taking and returning its content as bytes which is used to write it instead,
+for example Minifier().find.
+
+fingerprint, see Fingerprint(), names the file written for each destination
+from the digest of its content.  The file written is kept in its record so
+the digest is not computed again while the source is unchanged.
+
+The following methods are supported:
+* `scan(paths)` --- Find assets to copy in each path in paths, return a list
+  of (source, destination) tuples for Sass files.
+* `copy()` --- Copy the assets found by scan().
+* `prune()` --- Remove previously copied files that are no longer assets,
+  return a list of the files removed.
+* `records` --- Mapping of destination to source, size, modification time
+  and, if fingerprinted, the file written for this build.
+* `files` --- Mapping of destination to the file written.
+* `pending` --- List of files found by scan() not yet copied.
+"""
+
+    methods = ('copy', 'hardlink', 'reflink')
+
+    def __init__(self, output_dir, records=None, method='copy',
+                 filterdir=None, filterfile=None, force=False, jobs=None,
+                 transform=None, fingerprint=None):
+        super().__init__()
+        if method not in self.methods:
+            raise ValueError('asset_link must be one of {}'.format(', '.join(self.methods)))
+        self._output_dir = output_dir
+        self._previous = records or {}
+        self._method = method
+        self._filterdir = filterdir or (lambda root, name, entry=None: False)
+        self._filterfile = filterfile or (lambda name: False)
+        self._force = force
+        self._transform = transform or (lambda dst: None)
+        self._fingerprint = fingerprint
+        self._jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+        self._seen = set()
+        self.pending = []
+        self.records = {}
+
+
+    def scan(self, paths):
+        sass = []
+        for path in paths:
+            cpath = os.path.abspath(path)
+            parent = os.path.dirname(cpath)
+            print("Copying assets:        {path}".format(path=cpath))
+            self._scan(cpath, os.path.join(self._output_dir, os.path.relpath(cpath, parent)),
+                       self.pending, sass)
+        return sass
+
+
+    def copy(self):
+        copy, self.pending = self.pending, []
+        if not copy:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(self._jobs) as executor:
+            results = list(executor.map(self._copy, copy))
+        for (src, dst, record), error in zip(copy, results):
+            if error is None:
+                self.records[dst] = record
+            else:
+                print('Error: {}'.format(error))
+
+
+    @property
+    def files(self):
+        return {dst: _output(dst, record) for dst, record in self.records.items()}
+
+
+    def prune(self):
+        removed = []
+        current = set(self.files.values())
+        previous = {_output(dst, record) for dst, record in self._previous.items()}
+        for dst in sorted(previous - current):
+            if os.path.isfile(dst):
+                print("Removing asset:        {path}".format(path=dst))
+                os.remove(dst)
+                removed.append(dst)
+        return removed
+
+
+    def _scan(self, root, relroot, copy, sass):
+        """Scan root, add files to be copied to copy and Sass files to sass"""
+        dirs = []
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self._filterdir(root, entry.name, entry):
+                        dirs.append(entry.name)
+                    continue
+                if self._filterfile(entry.name) or not entry.is_file():
+                    continue
+
+                dst = os.path.join(relroot, entry.name)
+                if entry.name.endswith(('.sass', '.scss')):
+                    sass.append((entry.path, dst))
+                    continue
+                if dst in self._seen:
+                    continue
+                self._seen.add(dst)
+
+                st = entry.stat()
+                record = [entry.path, st.st_size, st.st_mtime_ns]
+                previous = self._previous.get(dst)
+                if self._force or not previous or previous[:3] != record \
+                        or (len(previous) > 3) != (self._fingerprint is not None) \
+                        or not os.path.isfile(_output(dst, previous)):
+                    copy.append((entry.path, dst, record))
+                else:
+                    self.records[dst] = previous
+
+        for name in sorted(dirs):
+            self._scan(os.path.join(root, name), os.path.join(relroot, name), copy, sass)
+
+
+    def _copy(self, item):
+        """Copy src to dst, or its fingerprinted name, atomically and return
+        an error message or None"""
+        import shutil
+        src, dst, record = item
+        data = None
+        transform = self._transform(dst)
+        if transform is not None:
+            with open(src, 'rb') as stream:
+                data = transform(stream.read())
+        if self._fingerprint is not None:
+            dst = self._fingerprint(dst, digest(data) if data is not None
+                                         else file_digest(src))
+            record.append(dst)
+        temp = os.path.join(os.path.dirname(dst),
+                            '.{}.{}.tmp'.format(os.path.basename(dst), os.getpid()))
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.lexists(temp):
+                os.remove(temp)
+            if data is not None:
+                with open(temp, 'wb') as stream:
+                    stream.write(data)
+                shutil.copystat(src, temp)
+            elif not (self._method == 'hardlink' and _hardlink(src, temp)
+                    or self._method == 'reflink' and _reflink(src, temp)):
+                shutil.copy2(src, temp)
+            os.replace(temp, dst)
+        except Exception as err:
+            if os.path.lexists(temp):
+                os.remove(temp)
+            return '{}: {}'.format(src, err)
+        return None
+
+
+class Fingerprint(object):
+    """
+# Fingerprint(config)
+
+Name output files after a digest of their content, eg. `main.3f9a1c2b.css`,
+so they may be cached indefinitely.  The names are written to an asset
+manifest in the output directory for other tools and are used by the `url`
+template filter.
+
+config is the `fingerprint` sitemap setting: true for the defaults, or a
+mapping of:
+* `extensions` --- Extensions of files to fingerprint, default css, js,
+  images and fonts.
+* `length` --- Number of digest characters in the name, default 8.
+* `manifest` --- Asset manifest name, default `asset-manifest.json`.
+
+The following methods are supported:
+* `__call__(filename, digest)` --- Return the fingerprinted filename, or
+  filename if it is not fingerprinted.
+* `write_manifest(output_dir, files)` --- Write the manifest for files, a
+  mapping of output filenames to the files written, return the mapping with
+  paths relative to output_dir.
+* `settings` --- List of the settings, which change when names would.
+"""
+
+    extensions = ('.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+                  '.avif', '.svg', '.woff', '.woff2', '.ttf', '.otf', '.eot')
+
+    def __init__(self, config):
+        super().__init__()
+        if config is True:
+            config = {}
+        self._extensions = tuple(config.get('extensions', self.extensions))
+        self._length = int(config.get('length', 8))
+        self.manifest = config.get('manifest', 'asset-manifest.json')
+        self.settings = [sorted(self._extensions), self._length]
+
+
+    def __call__(self, filename, digest):
+        if not filename.lower().endswith(self._extensions):
+            return filename
+        base, ext = os.path.splitext(filename)
+        return '{}.{}{}'.format(base, digest[:self._length], ext)
+
+
+    def write_manifest(self, output_dir, files):
+        import json
+        names = {os.path.relpath(dst, output_dir).replace(os.sep, '/'):
+                     os.path.relpath(output, output_dir).replace(os.sep, '/')
+                 for dst, output in files.items()}
+        data = json.dumps(names, indent=2, sort_keys=True).encode('utf-8')
+        write_if_changed(os.path.join(output_dir, self.manifest), data)
+        return names
+
+
+def _output(dst, record):
+    """The file written for dst"""
+    return record[3] if len(record) > 3 else dst
+
+
+def _hardlink(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError as err:
+        if err.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            return False
+        raise
+    return True
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            return False
+    import shutil
+    shutil.copystat(src, dst)
+    return True
@@ -0,0 +1,284 @@
+import os
+import pickle
+import hashlib
+from .utils import file_digest
+from . import timing
+
+
+class DiskCache(object):
+    """
+# DiskCache(directory, max_size)
+
+Persistent cache of pickled values stored one file per key under directory.
+Entries are written atomically so several processes may share a cache.  Reading
+an entry refreshes its modification time and `prune()` discards the least
+recently used entries until the cache is no larger than max_size bytes.
+
+The following methods are supported:
+* `key(*parts)` --- Digest of the strings or bytes in parts, for use as a key.
+* `get(key)` --- Return the value for key or None if not cached.
+* `put(key, value)` --- Store value for key.
+* `prune()` --- Evict entries to keep the cache within max_size.
+"""
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        super().__init__()
+        self._directory = directory
+        self._max_size = max_size
+
+
+    @staticmethod
+    def key(*parts):
+        hasher = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            hasher.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+
+    def _filename(self, key):
+        return os.path.join(self._directory, key[:2], key[2:])
+
+
+    def get(self, key):
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as stream:
+                value = pickle.load(stream)
+            os.utime(filename)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value
+
+
+    def put(self, key, value):
+        filename = self._filename(key)
+        temp = '{}.{}.tmp'.format(filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(temp, 'wb') as stream:
+                pickle.dump(value, stream, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, filename)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+
+    def prune(self):
+        entries, total = [], 0
+        try:
+            shards = [entry.path for entry in os.scandir(self._directory) if entry.is_dir()]
+        except OSError:
+            return
+        for shard in shards:
+            for entry in os.scandir(shard):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._max_size:
+                break
+            os.remove(path)
+            total -= size
+
+
+class SitemapCache(object):
+    """
+# SitemapCache(filename)
+
+The result of parsing a sitemap, pickled so it can be reused while none of
+the files it was read from nor the directories searched have changed.  Files
+are compared by size and modification time and, if those differ, digest.
+Directories are compared by modification time, which changes when entries
+are added, removed or renamed.  The header holding these is read first so
+the saved value is only unpickled if valid.
+
+The following methods are supported:
+* `load(key)` --- Return the value saved for key if still valid, else None.
+* `save(key, value, files, directories)` --- Save value for key.
+"""
+
+    version = 1
+
+    def __init__(self, filename):
+        super().__init__()
+        self._filename = filename
+
+
+    def load(self, key):
+        try:
+            with open(self._filename, 'rb') as stream:
+                header = pickle.load(stream)
+                if header['version'] != self.version or header['key'] != key:
+                    return None
+                for path, entry in header['files'].items():
+                    current = _file_entry(path, entry)
+                    if current is None or current[2] != entry[2]:
+                        return None
+                for path, mtime in header['directories'].items():
+                    if _mtime(path) != mtime:
+                        return None
+                return pickle.load(stream)
+        except Exception:
+            return None
+
+
+    def save(self, key, value, files, directories):
+        header = dict(version=self.version, key=key,
+                      files={path: _file_entry(path) for path in files},
+                      directories={path: _mtime(path) for path in directories})
+        temp = '{}.{}.tmp'.format(self._filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self._filename) or os.curdir, exist_ok=True)
+            with open(temp, 'wb') as stream:
+                pickle.dump(header, stream, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, stream, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self._filename)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(temp):
+                os.remove(temp)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _file_entry(path, previous=None):
+    """[mtime, size, digest] for path, the digest is reused from previous if
+    the size and modification time are unchanged"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+        return previous
+    return [st.st_mtime_ns, st.st_size, file_digest(path)]
+
+
+def hycmark_version():
+    try:
+        from importlib.metadata import version
+        return version('hycmark')
+    except Exception:
+        import hycmark
+        return getattr(hycmark, '__version__', '')
+
+
+class CachedRender(object):
+    """
+# CachedRender(source)
+
+Results of processing Markdown source text.  Each result is computed on
+demand from a CMark document, which is only parsed when a result is not in
+the cache, and saved in a record keyed by the source text and hycmark version
+so that unchanged Markdown is never parsed again.  The record is shared by all
+results for the source.  When the record is created the results needed to
+configure pages (title, excerpt, metadata and links) are computed from a
+single parse.  The HTML is only rendered when first needed, from the same
+document, which is then released rather than held for the rest of the build.
+
+If links are updated the rendered HTML and links depend on the link map too,
+so they are cached under names which include the map.
+
+The class attribute `cache` is a DiskCache set up by Halcyon, if it is None
+nothing is cached.
+"""
+
+    __slots__ = ('_source', '_cm', '_key', '_record', '_linkmap')
+
+    cache = None
+    version = None
+
+    # results computed together when the record is first created
+    _eager = {'title': lambda cm: cm.title(), 'excerpt': lambda cm: cm.excerpt(),
+              'metadata': lambda cm: cm.metadata, 'links': lambda cm: list(cm.links())}
+
+    # results which depend on the link map
+    _linked = ('links',)
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+        self._cm = None
+        self._key = None
+        self._record = None
+        self._linkmap = ()
+
+
+    @property
+    def cm(self):
+        """the CMark document, parsed on demand"""
+        if self._cm is None:
+            from hycmark import CMark
+            self._cm = CMark(self._source)
+            if self._linkmap:
+                self._cm.update_links(dict(self._linkmap))
+        return self._cm
+
+
+    def get(self, name, compute, *args, **kwargs):
+        """Return the result called name, computing it with compute(cm, *args,
+        **kwargs) if not yet known."""
+        if args or kwargs:
+            name = '{}{!r}'.format(name, (args, sorted(kwargs.items())))
+        if self._record is None:
+            self._load()
+        if name not in self._record:
+            with timing.phase('markdown'):
+                self._record[name] = compute(self.cm, *args, **kwargs)
+            self._save()
+        return self._record[name]
+
+
+    def known(self, name):
+        """Return the result called name if already known, else None"""
+        if self._record is None:
+            return None
+        return self._record.get(name)
+
+
+    def _name(self, name):
+        return '{}{!r}'.format(name, self._linkmap) if self._linkmap else name
+
+
+    def html(self):
+        html = self.get(self._name('html'), lambda cm: cm.render_html())
+        self._cm = None
+        return html
+
+
+    def links(self):
+        return self.get(self._name('links'), lambda cm: list(cm.links()))
+
+
+    def update_links(self, linkmap):
+        """Rewrite links using linkmap.  The document is only updated when it
+        is next parsed, HTML for the same map may already be cached."""
+        self._linkmap = tuple(sorted(linkmap.items()))
+        if self._cm is not None:
+            self._cm.update_links(linkmap)
+
+
+    def _load(self):
+        cache = CachedRender.cache
+        if cache is not None:
+            if CachedRender.version is None:
+                CachedRender.version = hycmark_version()
+            self._key = cache.key(CachedRender.version, self._source)
+            self._record = cache.get(self._key)
+        if self._record is None:
+            with timing.phase('markdown'):
+                # after update_links() the document no longer gives plain HTML
+                self._record = {name: compute(self.cm)
+                                    for name, compute in self._eager.items()
+                                    if not (self._linkmap and name in self._linked)}
+            self._save()
+
+
+    def _save(self):
+        if self._key is not None:
+            CachedRender.cache.put(self._key, self._record)
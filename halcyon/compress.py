@@ -0,0 +1,161 @@
+import os
+from .utils import digest, file_digest, write_if_changed
+
+
+def _gzip(data, level):
+    import gzip
+    return gzip.compress(data, level, mtime=0)
+
+
+def _brotli(data, level):
+    import brotli
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    import zstandard
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class Compressor(object):
+    """
+# Compressor(config, records, digests)
+
+Write precompressed copies of output files alongside them, eg. `page.html.gz`,
+for web servers which serve them directly (nginx gzip_static, brotli_static).
+Files are compressed on a thread pool which is not started until `start()` so
+that no threads are running if the caller forks processes first; files
+submitted before then are queued and read when compressed.  Each compressed
+file's digest is kept in records (usually a manifest entry) and it is not
+compressed again while its digest and the settings are unchanged.
+digests(filename) returns the digest of a file, see Digests().
+
+config is the `compress` sitemap setting: true for the defaults, or a mapping
+of:
+* `formats` --- List of `gz`, `br` (needs brotli) and `zst` (needs
+  zstandard), default `[gz]`.
+* `level` --- Compression level for every format, or a mapping of format to
+  level, defaults are gz 9, br 11 and zst 19.
+* `min_size` --- Smallest file to compress in bytes, default 256.
+* `extensions` --- Extensions of files to compress, default html, css, js,
+  svg, xml, json and txt.
+* `jobs` --- Number of threads, default one per CPU.
+
+The following methods are supported:
+* `submit(filename, data)` --- Compress filename, data is its content if
+  already in memory otherwise it is read if needed.
+* `start()` --- Start compressing, including the files queued so far.
+* `remove(filename)` --- Remove the compressed copies of filename.
+* `finish()` --- Start if needed, wait for compression to complete and
+  return the records.
+"""
+
+    formats = {'gz': (_gzip, 'gzip', 9),
+               'br': (_brotli, 'brotli', 11),
+               'zst': (_zstd, 'zstandard', 19)}
+    extensions = ('.html', '.css', '.js', '.svg', '.xml', '.json', '.txt')
+
+    def __init__(self, config, records=None, digests=file_digest):
+        super().__init__()
+        if config is True:
+            config = {}
+        formats = config.get('formats', ['gz'])
+        if isinstance(formats, str):
+            formats = [formats]
+        level = config.get('level', {})
+
+        self._formats = {}
+        for name in formats:
+            if name not in self.formats:
+                raise ValueError('compress format must be one of {}'
+                                 .format(', '.join(self.formats)))
+            compress, module, default = self.formats[name]
+            try:
+                __import__(module)
+            except ImportError:
+                print('Warning: {} is not installed, .{} files will not be written'
+                      .format(module, name))
+                continue
+            self._formats[name] = (compress, int(level.get(name, default)
+                                                 if isinstance(level, dict) else level))
+        self._min_size = int(config.get('min_size', 256))
+        self._extensions = tuple(config.get('extensions', self.extensions))
+        self._jobs = config.get('jobs') or os.cpu_count() or 1
+        self._digests = digests
+
+        # records are only reused if made with the same settings
+        self._settings = [sorted([name, level] for name, (_, level) in self._formats.items()),
+                          self._min_size]
+        records = records or {}
+        self._previous = records.get('files', {}) \
+                            if records.get('settings') == self._settings else {}
+        self._records = {}
+        self._submitted = set()
+        self._queue = []
+        self._executor = None
+
+
+    def submit(self, filename, data=None):
+        if not self._formats or filename in self._submitted \
+                or not filename.endswith(self._extensions):
+            return
+        self._submitted.add(filename)
+        if self._executor is None:
+            self._queue.append(filename)
+            return
+        self._executor.submit(self._compress, filename, data)
+
+
+    def start(self):
+        if self._executor is not None or not self._formats:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(self._jobs)
+        queue, self._queue = self._queue, []
+        for filename in queue:
+            self._executor.submit(self._compress, filename, None)
+
+
+    def remove(self, filename):
+        self._previous.pop(filename, None)
+        for name in self.formats:
+            sibling = '{}.{}'.format(filename, name)
+            if os.path.isfile(sibling):
+                os.remove(sibling)
+
+
+    def finish(self):
+        self.start()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._submitted = set()
+        self._previous.update(self._records)
+        self._records = {}
+        return dict(settings=self._settings, files=dict(self._previous))
+
+
+    def _compress(self, filename, data):
+        try:
+            key = digest(data) if data is not None else self._digests(filename)
+            siblings = ['{}.{}'.format(filename, name) for name in self._formats]
+            if key is None:
+                return
+            if self._previous.get(filename) == key \
+                    and all(os.path.isfile(sibling) for sibling in siblings):
+                self._records[filename] = key
+                return
+
+            if data is None:
+                with open(filename, 'rb') as stream:
+                    data = stream.read()
+            if len(data) >= self._min_size:
+                for sibling, (compress, level) in zip(siblings, self._formats.values()):
+                    write_if_changed(sibling, compress(data, level), lambda name: None)
+            else:
+                for sibling in siblings:
+                    if os.path.isfile(sibling):
+                        os.remove(sibling)
+            self._records[filename] = key
+        except Exception as err:
+            print('Error: {}: {}'.format(filename, err))
@@ -1,21 +1,35 @@
-import yaml
 import re
 import os
 from datetime import datetime
-from hycmark import CMark
 from collections import abc
+from .cache import CachedRender
+from .utils import canonicpath
 
 class Content(abc.Mapping):
     """
 # Content(filename)
 
 The Content() constructor takes a single filename argument which should be a
-regular file containing Markdown text.  The markdown content is transformed on
-demand.  The output format depends on what is provided by the underlying
-Markdown implementation. Currently only HTML is provided.
+regular file containing Markdown text.  The file is loaded in stages: the
+frontmatter is read on its own, the rest of the text only when it is needed
+and the markdown content is transformed on demand and the results cached, see
+CachedRender().  The output format depends on what is provided by the
+underlying Markdown implementation. Currently only HTML is provided.
+
+Mapping access merges the Markdown metadata over the frontmatter, so needs
+the metadata; this is taken from the cache without parsing the Markdown once
+the file has been processed.
+
+The class attribute `reads` may be set to a set, to which the filename of
+each Content() is added when a value read from its file is used.  Halcyon
+uses this to find the content a page's template used from other pages, and
+Plaintext() reports its reads in the same way.
 
 The following methods are supported:
 * `__str__()` --- The processed content of the Markdown file,
+* `release()` --- Discard the content text and processing results, keeping
+  a Summary() of the title, excerpt, metadata and table of contents.  Anything
+  else is loaded again, from the cache, if needed later.
 
 The following properties are supported:
 * `filename` --- Source file.
@@ -28,16 +42,26 @@ The following properties are supported:
 * `toc` --- List of 3-tuples for first and second level headings, if supported.
 """
 
+    __slots__ = ('_filename', '_raw_content', '_frontmatter', '_offset', '_date',
+                 '_md', '_summary', '_linkmap')
+
+    reads = None
+
     def __init__(self, filename):
         super().__init__()
         self._filename = filename
+        self.reload()
+
+
+    def reload(self):
+        """Discard content read from the file so it is read again on demand"""
         self._raw_content = None
-        self._content = None
         self._frontmatter = None
-        self._dict = dict()
-        self._toc = None
+        self._offset = None
         self._date = None
-        self._cm = None
+        self._md = None
+        self._summary = None
+        self._linkmap = None
 
 
     def __repr__(self):
@@ -46,29 +70,35 @@ The following properties are supported:
 
     def __str__(self):
         """content is processed markdown (or whatever) text"""
-        if self._content is None:
-            self._render()
-        return self._content
+        self._read()
+        self._include()
+        return self._md.html()
 
 
     def __getitem__(self, key):
-        self._include()
-        return self._dict[key]
+        for mapping in self._mappings():
+            if key in mapping:
+                return mapping[key]
+        raise KeyError(key)
 
 
     def __iter__(self):
-        self._include()
-        return iter(self._dict)
+        mappings = self._mappings()
+        if len(mappings) == 1:
+            return iter(mappings[0])
+        return iter(dict.fromkeys(key for mapping in reversed(mappings)
+                                      for key in mapping))
 
 
     def __len__(self):
-        self._include()
-        return len(self._dict)
+        mappings = self._mappings()
+        if len(mappings) == 1:
+            return len(mappings[0])
+        return len(set().union(*mappings))
 
 
     def __contains__(self, key):
-        self._include()
-        return key in self._dict
+        return any(key in mapping for mapping in self._mappings())
 
 
     @property
@@ -78,40 +108,61 @@ The following properties are supported:
 
     @property
     def source(self):
+        self._read()
         self._include()
         return self._raw_content
 
 
+    def release(self):
+        """Discard state needed only to render the content"""
+        if self._md is not None:
+            self._summary = Summary(self._md)
+            self._raw_content = None
+            self._md = None
+
+
     @property
     def heading(self):
+        self._read()
+        if self._summary is not None:
+            return self._summary.heading
         self._include()
-        return self._cm.title()
+        return self._md.get('title', lambda cm: cm.title())
 
 
     @property
     def excerpt(self):
+        self._read()
+        if self._summary is not None:
+            return self._summary.excerpt
         self._include()
-        return self._cm.excerpt()
+        return self._md.get('excerpt', lambda cm: cm.excerpt())
 
 
     @property
     def frontmatter(self):
         """frontmatter is YaML metadata at head of file.
            Always accessible via frontmatter property even if not a dictionary.
+           Reading it does not read the rest of the file.
         """
-        self._include()
+        self._read()
+        self._read_frontmatter()
         return self._frontmatter
 
 
     @property
     def metadata(self):
         """metadata is a dictionary of name-value pairs for markdown metadata"""
+        self._read()
+        if self._summary is not None:
+            return self._summary.metadata
         self._include()
-        return self._cm.metadata
+        return self._md.get('metadata', lambda cm: cm.metadata)
 
 
     @property
     def date(self):
+        self._read()
         if self._date is None:
             mtime = os.path.getmtime(self._filename)
             self._date = datetime.fromtimestamp(mtime).isoformat()
@@ -119,29 +170,46 @@ The following properties are supported:
 
 
     def toc(self, *args, **kwargs):
+        self._read()
+        if self._summary is not None and self._summary.toc is not None \
+                and not args and not kwargs:
+            return self._summary.toc
         self._include()
-        return self._cm.toc(*args, **kwargs)
+        return self._md.get('toc', lambda cm, *args, **kwargs: cm.toc(*args, **kwargs),
+                           *args, **kwargs)
 
 
     def links(self):
         self._include()
-        return self._cm.links()
+        return self._md.links()
 
 
     def update_links(self, linkmap):
         self._include()
-        return self._cm.update_links(linkmap)
+        self._linkmap = linkmap
+        return self._md.update_links(linkmap)
 
 
-    def _include(self):
-        """ Include pathname at current node.
+    def _read(self):
+        """note that a value read from the file was used, see reads"""
+        if Content.reads is not None:
+            Content.reads.add(self._filename)
+
+
+    def _mappings(self):
+        """markdown metadata and frontmatter which are non-empty dictionaries,
+        metadata first so that it overrides the frontmatter"""
+        self._read_frontmatter()
+        mappings = [mapping for mapping in (self.metadata, self._frontmatter)
+                            if isinstance(mapping, dict) and mapping]
+        return mappings or [{}]
+
 
-        Read frontmatter from filename.  Read the rest of the content from the
-        file as _raw_content.  If 'date' is missing from frontmatter, use the
-        file's modification time.
+    def _read_frontmatter(self):
+        """ Read frontmatter from filename and note where the content starts.
         """
 
-        if self._raw_content is not None:
+        if self._offset is not None:
             return
 
         def frontmatter(stream):
@@ -149,22 +217,90 @@ The following properties are supported:
             if stream.readline() != '---\n':
                 stream.seek(0)
                 return ''
-            return ''.join(iter(stream.readline, '---\n'))
+            lines = []
+            for line in iter(stream.readline, ''):
+                if line == '---\n':
+                    break
+                lines.append(line)
+            return ''.join(lines)
 
         with open(self._filename) as stream:
             fm = frontmatter(stream)
             if fm:
-                self._frontmatter = yaml.load(fm, Loader=yaml.CSafeLoader)
-            self._raw_content = stream.read()
+                import yaml
+                self._frontmatter = yaml.load(fm, Loader=frontmatter_loader())
+            self._offset = stream.tell()
 
-        self._cm = CMark(self._raw_content)
-        if isinstance(self._frontmatter, dict):
-            self._dict = self._frontmatter.copy()
-        if isinstance(self._cm.metadata, dict):
-            self._dict.update(self._cm.metadata)
 
+    def _include(self):
+        """ Include pathname at current node.
 
-    def _render(self):
-        if self._cm is None:
-            self._include()
-        self._content = self._cm.render_html()
+        Read the content following the frontmatter from the file as
+        _raw_content.  The Markdown is not parsed until a result which is not
+        cached is needed.
+        """
+
+        if self._raw_content is not None:
+            return
+
+        self._read_frontmatter()
+        with open(self._filename) as stream:
+            stream.seek(self._offset)
+            self._raw_content = stream.read()
+        self._md = CachedRender(self._raw_content)
+        if self._linkmap is not None:
+            # reapply links updated before the content was released
+            self._md.update_links(self._linkmap)
+
+
+# file names taken as !content and !plaintext when untagged
+markdown_ext = re.compile(r'.*\.(md|mkd|mdown|markdown)$')
+plaintext_ext = re.compile(r'.*\.txt$')
+
+_frontmatter_loader = None
+
+def frontmatter_loader():
+    """Return the YAML loader class for frontmatter, a CSafeLoader with the
+    !markdown, !content and !plaintext tags, which create values without
+    changing any other state, so frontmatter is parsed the same way whether or
+    not the sitemap came from the cache.  Halcyon's sitemap loader extends it.
+    The class is created when first needed."""
+    global _frontmatter_loader
+    if _frontmatter_loader is not None:
+        return _frontmatter_loader
+    import yaml
+    from .markdown import Markdown
+    from .plaintext import Plaintext
+
+    class FrontmatterLoader(yaml.CSafeLoader):
+        pass
+
+    def _content_tag(loader, node):
+        return Content(canonicpath(loader.construct_scalar(node)))
+    yaml.add_constructor('!content', _content_tag, Loader=FrontmatterLoader)
+    yaml.add_implicit_resolver('!content', markdown_ext, Loader=FrontmatterLoader)
+
+    def _plaintext_tag(loader, node):
+        return Plaintext(canonicpath(loader.construct_scalar(node)))
+    yaml.add_constructor('!plaintext', _plaintext_tag, Loader=FrontmatterLoader)
+    yaml.add_implicit_resolver('!plaintext', plaintext_ext, Loader=FrontmatterLoader)
+
+    def _markdown_tag(loader, node):
+        return Markdown(loader.construct_scalar(node))
+    yaml.add_constructor('!markdown', _markdown_tag, Loader=FrontmatterLoader)
+
+    _frontmatter_loader = FrontmatterLoader
+    return _frontmatter_loader
+
+
+class Summary(object):
+    """Compact record of the results for content which has been released.
+    The table of contents is None unless it had already been produced."""
+
+    __slots__ = ('heading', 'excerpt', 'metadata', 'toc')
+
+    def __init__(self, md):
+        self.heading = md.get('title', lambda cm: cm.title())
+        self.excerpt = md.get('excerpt', lambda cm: cm.excerpt())
+        self.metadata = md.get('metadata', lambda cm: cm.metadata)
+        self.toc = md.known('toc')
@@ -1,24 +1,35 @@
-import os, shutil
-import yaml
-import sass
-import re
-from .utils import canonicpath, getpath, expand_path, newer
-from .utils import changeext, truncate_middle, normalize_space
-from .utils import data_path, user_data_path, system_data_path
-from .page import Page
-from .content import Content
+import os
+import json
+from .utils import canonicpath, getpath, expand_path
+from .utils import changeext, truncate_middle, normalize_space, write_if_changed, digest
+from .utils import data_path, user_data_path, system_data_path, DirFilter
+from .page import Page, clear_indexes
+from .content import Content, frontmatter_loader, markdown_ext, plaintext_ext
 from .plaintext import Plaintext
-from .markdown import Markdown
-import jinja2
 from datetime import datetime
-from .include import include_config, search_page
-import traceback
-import configparser
+from .include import include_config, PageSearch
+from .manifest import Manifest, Digests, Dependencies, site_digest
+from .cache import DiskCache, CachedRender, SitemapCache
+from .assets import AssetSync, Fingerprint
+from .index import Index
+from .paginate import Pagination
+from .links import LinkMap
+from .compress import Compressor
+from .minify import Minifier
+from . import timing
+import time
 
 class Halcyon(object):
 
-    def __init__(self):
+    # template directories within a theme
+    _theme_templates = ('templates', '_layouts', 'include')
+
+    def __init__(self, force=False, jobs=1, profile=None, low_memory=False):
         super().__init__()
+        self._force = force                 # ignore the build manifest
+        self._jobs = jobs or os.cpu_count() # number of rendering processes
+        self._profile = profile             # write timings as JSON to file
+        self._low_memory = low_memory       # release content once rendered
 
         datadirs = system_data_path()
         self._theme_path = data_path(datadirs, 'halcyon', 'themes')
@@ -32,37 +43,79 @@ class Halcyon(object):
         self._sass_path = './sass:./scss'   # libsass search path
         self._assets_path = './assets'      # assets to copy to site
         self._site_root = '/'               # site URL path root
-        self._markdown_ext = re.compile(r'.*\.(md|mkd|mdown|markdown)$')
-        self._plaintext_ext = re.compile(r'.*\.txt$')
-
-        self._ignore_dir = {self._output_dir}
+        self._cache_dir = './.halcyon-cache' # build manifest and caches
+        self._cache_size = 256              # cache size limit in MiB
+        self._asset_link = 'copy'           # how assets are copied
+        self._prune_assets = False          # remove assets no longer present
+        self._index_config = {}             # Index() options
+        self._compress = None               # Compressor() options
+        self._minify = None                 # Minifier() options
+        self._fingerprint = None            # Fingerprint() options
+        self._markdown_ext = markdown_ext
+        self._plaintext_ext = plaintext_ext
+
+        # !search runs while the sitemap is parsed, before any configured
+        # output_dir or template_path is known, so only the defaults are
+        # skipped by it.  The configured directories are added in fixup_config().
+        self._filterdir = DirFilter([self._output_dir, self._cache_dir]
+                                    + expand_path(self._template_path))
         self._render_pages = []
         self._content = []
+        self._paginations = []
+        self._depends = []
+        self._directories = []
+        self._jinja = None
+        self._fingerprints = {}             # asset path to fingerprinted path
+        self._links = LinkMap([], assets=self._fingerprints)
+        self._compressor = None
+        self._minifier = None
+        self._fingerprinter = None
+        self._owners = {}                   # content filename to page, low_memory
+        self._pending = set()               # content of pages yet to render
+
+
+    def add_constructors(self):
+        """Return a YAML loader class with the sitemap's tags registered.  The
+        tags are registered on a private subclass of the frontmatter loader,
+        see frontmatter_loader(), used for the sitemap and the configuration
+        files it includes; !content and !plaintext also note the content.
+        This is done when the sitemap is parsed rather than on construction,
+        since a cached sitemap needs none."""
+        import yaml
+
+        class SitemapLoader(frontmatter_loader()):
+            pass
 
         # !config scalar-or-list --- scan directories for YaML files and parse content
         def _config_tag(loader, node):
             path = loader.construct_scalar(node)
-            return include_config(self._sitemap, path)
-        yaml.add_constructor('!config', _config_tag, Loader=yaml.CSafeLoader)
+            self._directories.extend(expand_path(path))
+            return include_config(self._sitemap, path, self._depends, type(loader))
+        yaml.add_constructor('!config', timing.timed('read_sitemap.config', _config_tag),
+                             Loader=SitemapLoader)
 
 
         # !search scalar-or-list --- scan directories and files for content and create pages
+        # Scans run in the background and the pages are added once the sitemap is loaded.
         def _search_tag(loader, node):
             path = loader.construct_scalar(node)
-            pages = search_page(path)
-            self._render_pages.extend(pages)
+            pages = self._search.search(path)
+            self._searches.append((len(self._render_pages), pages))
             return pages
-        yaml.add_constructor('!search', _search_tag, Loader=yaml.CSafeLoader)
+        yaml.add_constructor('!search', timing.timed('read_sitemap.search', _search_tag),
+                             Loader=SitemapLoader)
 
 
         # !content pathname --- load markdown content and frontmatter from file
+        # !markdown and the implicit !content and !plaintext resolvers for file
+        # names are inherited from the frontmatter loader.
         def _content_tag(loader, node):
             filename = loader.construct_scalar(node)
             content = Content(canonicpath(filename))
             self._content.append(content)
             return content
-        yaml.add_constructor('!content', _content_tag, Loader=yaml.CSafeLoader)
-        yaml.add_implicit_resolver('!content', self._markdown_ext, Loader=yaml.CSafeLoader)
+        yaml.add_constructor('!content', timing.timed('read_sitemap.content', _content_tag),
+                             Loader=SitemapLoader)
 
 
         def _plaintext_tag(loader, node):
@@ -70,14 +123,8 @@ class Halcyon(object):
             content = Plaintext(canonicpath(filename))
             self._content.append(content)
             return content
-        yaml.add_constructor('!plaintext', _plaintext_tag, Loader=yaml.CSafeLoader)
-        yaml.add_implicit_resolver('!plaintext', self._plaintext_ext, Loader=yaml.CSafeLoader)
-
-
-        # !markdown text --- mark text for markdown processing
-        def _markdown_tag(loader, node):
-            return Markdown(loader.construct_scalar(node))
-        yaml.add_constructor('!markdown', _markdown_tag, Loader=yaml.CSafeLoader)
+        yaml.add_constructor('!plaintext', timing.timed('read_sitemap.content', _plaintext_tag),
+                             Loader=SitemapLoader)
 
 
         # !page mapping --- create a page and merge frontmatter with supplied mapping
@@ -85,18 +132,58 @@ class Halcyon(object):
             page = Page(loader.construct_mapping(node))
             self._render_pages.append(page)
             return page
-        yaml.add_constructor('!page', _page_tag, Loader=yaml.CSafeLoader)
+        yaml.add_constructor('!page', _page_tag, Loader=SitemapLoader)
+
+
+        # !paginate mapping --- split items or index groups into pages
+        def _paginate_tag(loader, node):
+            pagination = Pagination(loader.construct_mapping(node))
+            self._paginations.append(pagination)
+            return pagination
+        yaml.add_constructor('!paginate', _paginate_tag, Loader=SitemapLoader)
+        return SitemapLoader
 
 
     def __call__(self, sitemap=None):
+        if self._profile:
+            timing.current = timing.Profile()
         try:
-            self.read_sitemap(sitemap or self._sitemap)
-            self.fixup_config()
-            self.copy_assets()
-            self.render_pages()
+            with timing.phase('read_sitemap'):
+                self.read_sitemap(sitemap or self._sitemap)
+            with timing.phase('fixup_config'):
+                self.fixup_config()
+            with timing.phase('copy_assets'):
+                self.copy_assets()
+            with timing.phase('render_pages'):
+                self.render_pages()
+            if self._compressor is not None:
+                with timing.phase('compress'):
+                    self._manifest['compressed'] = self._compressor.finish()
+            self._manifest.save()
+            CachedRender.cache.prune()
+            if self._minifier is not None:
+                self._minifier.prune()
         except Exception as err:
             print('Error: {}'.format(err))
             #traceback.print_exc()
+        if self._profile:
+            self.write_profile()
+
+
+    def write_profile(self):
+        """Write the build profile, splitting out time spent in YAML parsing
+        from sitemap tag expansion and in copying from Sass compilation."""
+        phases = timing.current.phases
+        tags = sum(phases.get('read_sitemap.' + tag, 0.0)
+                   for tag in ('config', 'search', 'content'))
+        phases['read_sitemap.yaml'] = phases.pop('read_sitemap.load', 0.0) - tags
+        phases['copy_assets.copy'] = phases.get('copy_assets', 0.0) \
+                                        - phases.get('copy_assets.sass', 0.0)
+        try:
+            timing.current.write(self._profile)
+        except OSError as err:
+            print('Error: {}'.format(err))
+        timing.current = None
 
 
     def read_sitemap(self, sitemap):
@@ -112,10 +199,65 @@ class Halcyon(object):
         - assets_path   Search path for copied assets   './assets'
         - theme_path    Search path for Halcyon themes
                         in addition to system defaults.
+        - cache_dir     Build manifest and caches       './.halcyon-cache'
+        - cache_size    Markdown cache size limit, MiB  256
+        - asset_link    Copy assets using copy,         'copy'
+                        hardlink or reflink
+        - prune_assets  Remove copied assets whose      false
+                        source has gone
+        - index         Options for halcyon.index, a mapping of:
+            group_by    Keys to group pages by          [tags, categories]
+            sort_by     Key to sort pages by            date
+            reverse     Sort newest first               true
+        - compress      Write precompressed copies of   false
+                        output files, true or a mapping
+                        of options, see Compressor()
+        - minify        Minify HTML, CSS and JavaScript false
+                        output, true or a mapping of
+                        options, see Minifier()
+        - fingerprint   Name assets and compiled Sass   false
+                        after a digest of their content,
+                        true or a mapping of options,
+                        see Fingerprint()
         The site theme is specified at top level using 'theme'.
+
+        The parsed sitemap is cached and reused until the sitemap, a
+        configuration file or a searched directory changes, see SitemapCache().
         """
-        with open(sitemap) as stream:
-            self._data = yaml.load(stream, Loader=yaml.CSafeLoader)
+        self._depends.append(sitemap)
+
+        # The parsed sitemap is cached in the default cache directory since
+        # cache_dir is not known until it is parsed.
+        cache = SitemapCache(os.path.join(self._cache_dir, 'sitemap.pickle'))
+        key = (os.path.abspath(sitemap), os.getcwd())
+        with timing.phase('read_sitemap.cache'):
+            state = None if self._force else cache.load(key)
+        if state is not None:
+            print("Cached sitemap:        {path}".format(path=sitemap))
+            (self._data, self._render_pages, self._content,
+             self._paginations, self._depends) = state
+        else:
+            import yaml
+            loader = self.add_constructors()
+            self._search = PageSearch(self._filterdir)
+            self._searches = []
+            with open(sitemap) as stream, timing.phase('read_sitemap.load'):
+                self._data = yaml.load(stream, Loader=loader)
+                with timing.phase('read_sitemap.search'):
+                    self._search.finish()
+
+            # insert pages found by !search in sitemap order
+            for index, pages in reversed(self._searches):
+                self._render_pages[index:index] = pages
+
+            # the tree is saved before configuration items are popped from it
+            directories = self._directories + self._search.directories
+            directories.extend(os.path.dirname(os.path.abspath(content.filename))
+                               for content in self._content)
+            with timing.phase('read_sitemap.cache'):
+                cache.save(key, (self._data, self._render_pages, self._content,
+                                 self._paginations, self._depends),
+                           self._depends, directories)
 
         # Migrate config variables to 'halcyon' key.
         config = self._data.get('halcyon', self._data)
@@ -126,6 +268,30 @@ class Halcyon(object):
         self._date_format = canonicpath(config.pop('date_format', self._date_format))
         self._output_dir = canonicpath(config.pop('output_dir', self._output_dir))
         self._site_root = config.pop('root', self._site_root)
+        self._cache_dir = canonicpath(config.pop('cache_dir', self._cache_dir))
+
+        self._cache_size = int(config.pop('cache_size', self._cache_size))
+        self._asset_link = config.pop('asset_link', self._asset_link)
+        self._prune_assets = bool(config.pop('prune_assets', self._prune_assets))
+        self._index_config = config.pop('index', None) or self._index_config
+        self._compress = config.pop('compress', self._compress)
+        self._minify = config.pop('minify', self._minify)
+        self._fingerprint = config.pop('fingerprint', self._fingerprint)
+
+        # load the manifest from the previous build
+        self._manifest = Manifest(os.path.join(self._cache_dir, 'manifest.json'))
+        self._digests = Digests(self._manifest.get('digests'))
+        CachedRender.cache = DiskCache(os.path.join(self._cache_dir, 'markdown'),
+                                       self._cache_size * 1024 * 1024)
+        if self._minify:
+            self._minifier = Minifier(self._minify,
+                                      DiskCache(os.path.join(self._cache_dir, 'minify'),
+                                                self._cache_size * 1024 * 1024))
+        if self._fingerprint:
+            self._fingerprinter = Fingerprint(self._fingerprint)
+        if self._compress:
+            self._compressor = Compressor(self._compress, self._manifest.get('compressed'),
+                                          self._digests)
 
         # build up the templates path and assets path
         # add variables from sitemap first so they can override the theme, if necessary
@@ -171,9 +337,10 @@ class Halcyon(object):
         else:
             theme_path = expand_path(config.pop('theme_path'))
             theme_path.extend(self._theme_path)
+        self._theme_path = theme_path
 
         for item in theme_path:
-            for templates in ('templates', '_layouts', 'include'):
+            for templates in self._theme_templates:
                 directory = os.path.join(item, theme, templates)
                 template_path.append(directory)
             for scss in ('sass', 'scss', '_sass', '_scss'):
@@ -197,28 +364,44 @@ class Halcyon(object):
         # that menu URLs etc work properly.
         for page in self._render_pages:
             page.configure(self._site_root)
+            if self._low_memory:
+                page.release()
 
-        #XXX fix up links
+        # indexes of the configured pages for templates
+        self.paginate()
+        self.resolve_links()
 
-        # ignore output directories and template directories
-        self._ignore_dir.update(self._template_path)
-        self._ignore_dir.update(page['output_dir'] for page in self._render_pages
+        # ignore output directories, template directories and the cache
+        self._filterdir.update(self._template_path)
+        self._filterdir.update([self._output_dir, self._cache_dir])
+        self._filterdir.update(page['output_dir'] for page in self._render_pages
                                         if 'output_dir' in page)
 
 
-    def copy_assets(self):
-        def filterdir(root, name):
-            """
-            Return True if the name starts with . or _ or the dirname is the
-            same file as any of the directories in the ignore_dir collection.
-            Dirname must exist and only existing directories are tested.
-            """
-            if name.startswith(('.', '_')):
-                return True
-            dirname = os.path.join(root, name)
-            return any(os.path.samefile(dirname, item)
-                       for item in self._ignore_dir if os.path.exists(item))
+    def paginate(self):
+        """Index the pages and generate the pages for each !paginate tag,
+        replacing any generated previously.  Pages generated previously are
+        removed first so they are not indexed.  Called once the pages are
+        configured."""
+        generated = {id(page) for pagination in self._paginations for page in pagination}
+        self._render_pages[:] = [page for page in self._render_pages
+                                      if id(page) not in generated]
+        self._index = Index(self._render_pages, **self._index_config)
+        for pagination in self._paginations:
+            self._render_pages.extend(pagination.expand(self._index, self._site_root))
 
+
+    def resolve_links(self):
+        """Rewrite links between content files to the URLs of the pages
+        rendered from them and report broken links."""
+        self._links = LinkMap(self._render_pages, self._site_root, self._markdown_ext,
+                              self._fingerprints)
+        for source, link in self._links.resolve(self._render_pages, self._low_memory):
+            print("Broken link:           {link} in {source}".format(link=link,
+                                                                  source=source))
+
+
+    def copy_assets(self):
         def filterfile(name):
             if name == self._sitemap or name.startswith(('.', '_')):
                 return True
@@ -227,39 +410,217 @@ class Halcyon(object):
         # Copy assets to the destination dir.  Ignore files and directories
         # starting with '_'. Scan source directory then theme directory.
         # During theme scan ignore files if destination already present.
-        for path in self._assets_path:
-            cpath = os.path.abspath(path)
-            parent = os.path.dirname(cpath)
-            print("Copying assets:        {path}".format(path=cpath))
-            for root, dirs, files in os.walk(cpath):
-                # filter the list of subdirectories to search
-                dirs[:] = [item for item in dirs if not filterdir(root, item)]
-
-                # relroot is the path to the files' output directory
-                relroot = os.path.join(self._output_dir, os.path.relpath(root, start=parent))
-
-                # create tuples of source and destination filenames
-                # ignore names stating with . or _ and the sitemap itself
-                copy = [(os.path.join(root, item), os.path.join(relroot, item))
-                            for item in files if not filterfile(item)]
-
-                # copy the files, ignore files already present unless source is newer
-                # Hack: if source file is SASS or SCSS, process with libsass
-                for src, dst in copy:
+        # assets are copied again if the minify or fingerprint settings changed
+        minify = self._minifier.settings if self._minifier is not None else None
+        fingerprint = self._fingerprinter.settings \
+                            if self._fingerprinter is not None else None
+        force = self._force or self._manifest.get('minify') != minify \
+                            or self._manifest.get('fingerprint') != fingerprint
+        sync = AssetSync(self._output_dir, self._manifest.get('assets'), self._asset_link,
+                         self._filterdir, filterfile, force,
+                         transform=self._minifier.find if self._minifier is not None else None,
+                         fingerprint=self._fingerprinter)
+        sources = sync.scan(self._assets_path)
+
+        # Hack: if source file is SASS or SCSS, process with libsass.  Entry
+        # points which are out of date are compiled on a process pool while
+        # the other assets are copied.
+        previous = {} if self._force else self._manifest.get('sass', {})
+        compiled = {}
+        pending = []
+        for src, dst in sources:
+            dstcss = changeext(dst, 'css')
+            record = previous.get(dstcss)
+            if self._sass_current(dstcss, record):
+                compiled[dstcss] = record
+            else:
+                print("Compiling sass:        {path}".format(path=src))
+                pending.append((src, dstcss))
+
+        executor = None
+        if len(pending) > 1 or pending and sync.pending:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            try:
+                context = multiprocessing.get_context('fork')
+                executor = ProcessPoolExecutor(min(len(pending), os.cpu_count() or 1),
+                                               mp_context=context)
+            except ValueError:
+                pass
+        try:
+            if executor is not None:
+                results = [executor.submit(_compile_sass, src, dst, self._sass_path,
+                                           self._sass_style())
+                           for src, dst in pending]
+            sync.copy()
+            removed = sync.prune() if self._prune_assets else []
+            self._manifest['assets'] = sync.records
+            self._manifest['minify'] = minify
+            self._manifest['fingerprint'] = fingerprint
+            if self._compressor is not None:
+                for dst in sync.files.values():
+                    self._compressor.submit(dst)
+                for dst in removed:
+                    self._compressor.remove(dst)
+
+            with timing.phase('copy_assets.sass'):
+                for index, (src, dst) in enumerate(pending):
+                    if executor is not None:
+                        error, css, sourcemap = results[index].result()
+                    else:
+                        error, css, sourcemap = _compile_sass(src, dst, self._sass_path,
+                                                              self._sass_style())
+                    if error is not None:
+                        print('Error: {}'.format(error))
+                        continue
                     try:
-                        if src.endswith(('.sass', '.scss')):
-                            dstcss = changeext(dst, 'css')
-                            css = sass.compile(filename=src,
-                                               include_paths=self._sass_path)
-                            os.makedirs(relroot, exist_ok=True)
-                            with open(dstcss, 'w') as stream:
-                                stream.write(css)
-                        elif not os.path.isfile(dst) or newer(src, dst):
-                            os.makedirs(relroot, exist_ok=True)
-                            shutil.copy(src, dst)
+                        compiled[dst] = self.write_sass(src, dst, css, sourcemap)
                     except Exception as err:
                         print('Error: {}'.format(err))
                         #traceback.print_exc()
+                        continue
+                    # remove the output of the previous compilation if renamed
+                    stale = previous.get(dst, {}).get('output', dst)
+                    if self._prune_assets and stale != compiled[dst].get('output', dst) \
+                            and os.path.isfile(stale):
+                        print("Removing asset:        {path}".format(path=stale))
+                        os.remove(stale)
+                        if self._compressor is not None:
+                            self._compressor.remove(stale)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self._manifest['sass'] = compiled
+
+        # the asset manifest maps asset names to fingerprinted names
+        self._fingerprints.clear()
+        stale = self._manifest.get('asset_manifest')
+        if stale and os.path.isfile(stale) and (self._fingerprinter is None
+                or stale != os.path.join(self._output_dir, self._fingerprinter.manifest)):
+            os.remove(stale)
+        self._manifest['asset_manifest'] = None
+        if self._fingerprinter is not None:
+            files = sync.files
+            files.update((dst, record.get('output', dst)) for dst, record in compiled.items())
+            self._fingerprints.update(self._fingerprinter.write_manifest(self._output_dir,
+                                                                         files))
+            self._manifest['asset_manifest'] = os.path.join(self._output_dir,
+                                                            self._fingerprinter.manifest)
+
+
+    def _sass_style(self):
+        """libsass output style, None for its default"""
+        return self._minifier.sass_style if self._minifier is not None else None
+
+
+    def _sass_current(self, dst, record):
+        """True if record shows dst was compiled with the same include path,
+        output style and fingerprint settings and neither its source nor any
+        file it imported has changed since."""
+        fingerprint = self._fingerprinter.settings \
+                            if self._fingerprinter is not None else None
+        return bool(record) and record['include_paths'] == self._sass_path \
+                and record.get('output_style') == self._sass_style() \
+                and record.get('fingerprint') == fingerprint \
+                and os.path.isfile(record.get('output', dst)) \
+                and all(self._digests(filename) == digest
+                        for filename, digest in record['depends'].items())
+
+
+    def write_sass(self, src, dst, css, sourcemap):
+        """Write css compiled from src to dst, or its fingerprinted name, if
+        changed, and return a record of its inputs and the file written.
+        Imported files are found from the source map."""
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        data = css.encode('utf-8')
+        output = dst
+        if self._fingerprinter is not None:
+            output = self._fingerprinter(dst, digest(data))
+        write_if_changed(output, data, self._digests)
+        if self._compressor is not None:
+            self._compressor.submit(output, data)
+
+        mapdir = os.path.dirname(os.path.abspath(dst + '.map'))
+        sources = [os.path.abspath(src)]
+        sources.extend(os.path.normpath(os.path.join(mapdir, item))
+                       for item in json.loads(sourcemap).get('sources', []))
+        record = dict(include_paths=self._sass_path, output_style=self._sass_style(),
+                      depends={filename: self._digests(filename) for filename in sources})
+        if self._fingerprinter is not None:
+            record.update(fingerprint=self._fingerprinter.settings, output=output)
+        return record
+
+
+    def watch_paths(self):
+        """Return a tuple of the directories containing the site's sources
+        and the directories to ignore when watching for changes."""
+        paths = [os.curdir]
+        paths.extend(os.path.dirname(os.path.abspath(filename))
+                     for filename in self._depends)
+        paths.extend(expand_path(self._template_path))
+        paths.extend(expand_path(self._sass_path))
+        paths.extend(expand_path(self._assets_path))
+        return paths, [self._output_dir, self._cache_dir]
+
+
+    def update(self, changed):
+        """Rebuild after the files in changed were modified.
+
+        Modified content is reloaded and only pages affected by changes are
+        rendered.  Return False if the site must be rebuilt from the sitemap,
+        that is if the sitemap or configuration changed or content files were
+        added or removed.
+        """
+        changed = {os.path.abspath(path) for path in changed if path is not None} \
+                        if None not in changed else None
+        if changed is None or changed & {os.path.abspath(filename)
+                                            for filename in self._depends}:
+            return False
+
+        contents = {os.path.abspath(content.filename): content
+                        for content in self._content}
+        pages = {}
+        for page in self._render_pages:
+            for filename in page._depends():
+                pages.setdefault(os.path.abspath(filename), []).append(page)
+
+        assets = tuple(os.path.join(os.path.abspath(path), '')
+                       for path in expand_path(self._sass_path)
+                                 + expand_path(self._assets_path))
+        copy = False
+        try:
+            for path in changed:
+                if path in contents or path in pages:
+                    if not os.path.isfile(path):
+                        return False
+                    if path in contents:
+                        contents[path].reload()
+                    for page in pages.get(path, []):
+                        page._content.reload()
+                        page.reconfigure(self._site_root)
+                        if self._low_memory:
+                            page.release()
+                elif path.startswith(assets):
+                    copy = True
+                elif self._markdown_ext.match(path) and os.path.isfile(path):
+                    return False
+            self.paginate()
+            self.resolve_links()
+
+            if copy:
+                self.copy_assets()
+            self.render_pages()
+            if self._compressor is not None:
+                self._manifest['compressed'] = self._compressor.finish()
+            self._manifest.save()
+            CachedRender.cache.prune()
+            if self._minifier is not None:
+                self._minifier.prune()
+        except Exception as err:
+            print('Error: {}'.format(err))
+            #traceback.print_exc()
+        return True
 
 
     def add_filters(self, env):
@@ -275,9 +636,12 @@ class Halcyon(object):
             return value[start:limit]
         env.filters['chop'] = _chop
 
-        def _url(value, **kwargs):
-            print("reminder implement url() filter")
-            return value
+        # pass_context stops Jinja evaluating the filter when compiling a
+        # template, which would fix URLs of fingerprinted assets in bytecode
+        from jinja2 import pass_context
+        @pass_context
+        def _url(context, value, **kwargs):
+            return self._links.url(value)
         env.filters['url'] = _url
 
         def _obfuscate(string, **kwargs):
@@ -294,24 +658,259 @@ class Halcyon(object):
         env.filters['normalize_space'] = _normalize_space
 
 
-    def render_pages(self):
-        loader = jinja2.FileSystemLoader(self._template_path, encoding='utf-8',
-                                         followlinks=True)
-        jinja_env = jinja2.Environment(loader=loader, trim_blocks=True,
-                                       lstrip_blocks=True)
+    def jinja_env(self):
+        """Create the Jinja environment with Halcyon's filters and the sitemap
+        as globals."""
+        jinja_env = self._environment(self._template_path)
         self.add_filters(jinja_env)
+        jinja_env.globals.update(self._data)
+        return jinja_env
+
+
+    def _environment(self, template_path):
+        """Jinja environment for template_path with a persistent bytecode cache.
+        Cached bytecode is keyed by template name and filename so templates
+        from different themes and include directories do not collide."""
+        import jinja2
+        loader = jinja2.FileSystemLoader(template_path, encoding='utf-8',
+                                         followlinks=True)
+        # bytecode from versions which compiled url filter results in is not used
+        cache = jinja2.FileSystemBytecodeCache(os.path.join(self._cache_dir, 'jinja'),
+                                               '__halcyon_%s.cache')
+        os.makedirs(os.path.join(self._cache_dir, 'jinja'), exist_ok=True)
+        return jinja2.Environment(loader=loader, trim_blocks=True,
+                                  lstrip_blocks=True, bytecode_cache=cache)
+
+
+    def compile_templates(self, sitemap=None):
+        """Compile the site's templates and those of every theme found on the
+        theme path into the bytecode cache ahead of a build."""
+        try:
+            self.read_sitemap(sitemap or self._sitemap)
+        except Exception as err:
+            print('Error: {}'.format(err))
+            return
+
+        themes = {}
+        for item in self._theme_path:
+            for theme in sorted(os.listdir(item)):
+                themes.setdefault(theme, []).extend(
+                        os.path.join(item, theme, templates)
+                        for templates in self._theme_templates)
+        paths = [self._template_path]
+        paths.extend(themes[theme] for theme in sorted(themes))
+
+        for template_path in paths:
+            template_path = [path for path in template_path if os.path.isdir(path)]
+            if not template_path:
+                continue
+            jinja_env = self._environment(template_path)
+            self.add_filters(jinja_env)
+            for name in jinja_env.list_templates():
+                try:
+                    jinja_env.get_template(name)
+                except Exception as err:
+                    print('Error: {}: {}'.format(name, err))
+            print("Compiled templates:    {path}".format(path=os.pathsep.join(template_path)))
+
+
+    def render_pages(self):
         self._data['halcyon'].update(sitemap=self._sitemap,
                                      output_dir=self._output_dir,
                                      template_path=self._template_path,
                                      sass_path=self._sass_path,
                                      assets_path=self._assets_path,
                                      root=self._site_root,
-                                     pages=self._render_pages)
-        jinja_env.globals.update(self._data)
-
-        for page in self._render_pages:
+                                     pages=self._render_pages,
+                                     index=self._index)
+        if self._jinja is None:
+            self._jinja = self.jinja_env()
+        jinja_env = self._jinja
+        clear_indexes()
+
+        # Pages recorded in the manifest are up to date if the inputs shared by
+        # all pages, the page's own source and templates and the content of
+        # other pages read when it was last rendered are unchanged.
+        recorded = {}
+        if self._manifest.get('output_dir') == self._output_dir:
+            recorded = self._manifest.get('pages', {})
+        previous = {} if self._force else recorded
+        files = list(self._depends)
+        if self._fingerprinter is not None:
+            files.append(os.path.join(self._output_dir, self._fingerprinter.manifest))
+        site = site_digest(files, self._render_pages, self._digests)
+        if self._minifier is not None:
+            site = [site, self._minifier.settings]
+        dependencies = Dependencies(jinja_env, self._digests,
+                                    self._manifest.get('templates'))
+
+        pages = {}
+        render = []
+        unchanged = 0
+        for index, page in enumerate(self._render_pages):
+            path = page['path']
             try:
-                page.render(self._output_dir, jinja_env)
+                record = dict(site=site, depends=dependencies(page))
             except Exception as err:
                 print('Error: {}'.format(err))
-                #traceback.print_exc()
+                continue
+            if self._current(previous.get(path), record) \
+                    and os.path.isfile(os.path.join(self._output_dir, path)):
+                pages[path] = previous[path]
+                unchanged += 1
+            else:
+                render.append((index, record))
+
+        # In low memory mode content read by other pages' templates is released
+        # once its own page is not waiting to be rendered, see _render().
+        if self._low_memory:
+            self._owners = {page._content.filename: page for page in self._render_pages
+                                                     if isinstance(page._content, Content)}
+            self._pending = {getattr(self._render_pages[index]._content, 'filename', None)
+                             for index, _ in render}
+
+        # Render out of date pages.  Results arrive in page order.  Compression
+        # threads are only started once no render processes will be forked.
+        written = 0
+        if self._jobs > 1 and len(render) > 1:
+            results = self._render_parallel([index for index, _ in render])
+            if self._compressor is not None:
+                self._compressor.start()
+        else:
+            compress = None
+            if self._compressor is not None:
+                self._compressor.start()
+                compress = self._compressor.submit
+            results = (_render(self, jinja_env, index, compress) for index, _ in render)
+        for (index, record), (error, changed, elapsed, reads) in zip(render, results):
+            page = self._render_pages[index]
+            path = page['path']
+            print("Processing page:       {path}".format(path=path))
+            if timing.current is not None and elapsed is not None:
+                timing.current.page(path, page._layout(jinja_env), *elapsed)
+            if error is not None:
+                print('Error: {}'.format(error))
+                continue
+            for filename in reads:
+                record['depends'].setdefault(filename, self._digests(filename))
+            pages[path] = record
+            if changed:
+                written += 1
+            else:
+                unchanged += 1
+
+        # remove pages whose sources have gone
+        current = {page['path'] for page in self._render_pages}
+        deleted = 0
+        for path in sorted(set(recorded) - current):
+            filename = os.path.join(self._output_dir, path)
+            if os.path.isfile(filename):
+                print("Removing page:         {path}".format(path=path))
+                os.remove(filename)
+                deleted += 1
+                if self._compressor is not None:
+                    self._compressor.remove(filename)
+
+        # compress pages rendered by worker processes or left unchanged
+        if self._compressor is not None:
+            for path in pages:
+                self._compressor.submit(os.path.join(self._output_dir, path))
+
+        print("Pages: {written} written, {unchanged} unchanged, {deleted} deleted"
+              .format(written=written, unchanged=unchanged, deleted=deleted))
+
+        self._manifest.update(output_dir=self._output_dir, pages=pages,
+                              templates=dependencies.used,
+                              digests=self._digests.used)
+
+
+    def _current(self, previous, record):
+        """True if previous, a page's record from the last build, has the
+        same site digest and dependencies as record and any other files it
+        depends on, the content read from other pages, are unchanged."""
+        if not previous or previous['site'] != record['site']:
+            return False
+        depends = previous['depends']
+        return all(depends.get(filename) == digest
+                   for filename, digest in record['depends'].items()) \
+                and all(self._digests(filename) == digest
+                        for filename, digest in depends.items()
+                        if filename not in record['depends'])
+
+
+    def _render_parallel(self, indexes):
+        """Render pages on a pool of worker processes.
+
+        Workers are forked so they inherit the sitemap and pages, each sets up
+        its own Jinja environment once.  Only page indexes and error messages
+        cross the process boundary.
+        """
+        import multiprocessing
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            print('Warning: --jobs requires fork(), rendering serially')
+            jinja_env = self.jinja_env()
+            return [_render(self, jinja_env, index) for index in indexes]
+
+        jobs = min(self._jobs, len(indexes))
+        chunksize = max(1, len(indexes) // (jobs * 4))
+        with context.Pool(jobs, initializer=_render_init, initargs=(self,)) as pool:
+            return list(pool.imap(_render_worker, indexes, chunksize))
+
+
+def _compile_sass(src, dst, include_paths, output_style=None):
+    """Compile Sass file src for output as dst, return a tuple of an error
+    message on failure or None, the CSS and the source map."""
+    import sass
+    try:
+        css, sourcemap = sass.compile(filename=src, include_paths=include_paths,
+                                      output_style=output_style or 'nested',
+                                      source_map_filename=os.path.abspath(dst + '.map'),
+                                      output_filename_hint=os.path.abspath(dst),
+                                      omit_source_map_url=True)
+    except Exception as err:
+        return '{}: {}'.format(src, err), None, None
+    return None, css, sourcemap
+
+
+# Worker process state for Halcyon._render_parallel()
+_worker = None
+
+def _render_init(halcyon):
+    global _worker
+    _worker = (halcyon, halcyon.jinja_env())
+
+
+def _render_worker(index):
+    return _render(*_worker, index)
+
+
+def _render(halcyon, jinja_env, index, compress=None):
+    """Render a page, return a tuple of an error message on failure or None,
+    whether the output file was written, if profiling a tuple of the total and
+    Markdown rendering times, otherwise None, and the content files read, see
+    Content.reads"""
+    start, markdown = time.perf_counter(), timing.elapsed('markdown')
+    Content.reads = set()
+    try:
+        page = halcyon._render_pages[index]
+        changed = page.render(halcyon._output_dir, jinja_env, halcyon._digests, compress,
+                              halcyon._minifier)
+        if halcyon._low_memory:
+            page.release()
+            halcyon._pending.discard(getattr(page._content, 'filename', None))
+            for filename in Content.reads - halcyon._pending:
+                owner = halcyon._owners.get(filename)
+                if owner is not None:
+                    owner.release()
+    except Exception as err:
+        #traceback.print_exc()
+        return str(err), False, None, []
+    finally:
+        reads, Content.reads = Content.reads, None
+    reads = sorted(reads)
+    if timing.current is None:
+        return None, changed, None, reads
+    return None, changed, (time.perf_counter() - start,
+                           timing.elapsed('markdown') - markdown), reads
@@ -2,14 +2,15 @@ import os
 from .page import Page
 from .content import Content
 from .utils import rootname, expand_path, canonicpath, changeext, pathjoin
-import yaml
 
 # read extra config - add to item named with basename of file
 # FIXME different directories with the same filename will clobber
 
-def include_config(sitemap, include):
+def include_config(sitemap, include, depends=None, loader=None):
 
     config = {}
+    if depends is None:
+        depends = []
 
     def loaddir(pathname):
         for basename in os.listdir(pathname):
@@ -22,9 +23,11 @@ def include_config(sitemap, include):
             return
         root = rootname(pathname)
         print("Reading configuration: {conf}".format(conf=pathname))
+        import yaml
         with open(pathname) as cfp:
-            conf = yaml.load(cfp, Loader=yaml.CSafeLoader)
+            conf = yaml.load(cfp, Loader=loader or yaml.CSafeLoader)
         config[root] = conf
+        depends.append(pathname)
 
     for pathname in expand_path(include):
         if os.path.isdir(pathname):
@@ -33,39 +36,96 @@ def include_config(sitemap, include):
             loadfile(pathname)
     return config
 
-# This scans each directory looking for source files (markdown) and constructs
-# a list of Page()s.
 
-def search_page(include):
+class PageSearch(object):
+    """
+# PageSearch(filterdir, jobs)
 
-    prefixes = ('.', '_')
-    extensions = ('.md', '.mkd', '.mdown', '.markdown')
-    self_render_pages = []
-
-    def whitelist(name):
-        return not name.startswith(prefixes) and name.endswith(extensions)
-
-    def removeprefix(s,p):
-        return s[len(p):] if s.startswith(p) else s
-
-    for name in expand_path(include):
-        canon = canonicpath(name)
-        prefix = os.path.basename(canon) if canon.startswith(('.','/')) else ''
+Scan directories for source files concurrently.  `search(include)` starts
+scanning the directories named by include on a thread pool and returns an
+empty list, which `finish()` fills with a Page() for each source file found.
+Several searches may be started before calling `finish()` so their scans
+overlap.  Directories are read with os.scandir() and pages are ordered by
+directory, files before subdirectories, sorted by name.  Once finished,
+`directories` lists every directory scanned.
 
-        for root, dirs, files in os.walk(canon):
-            # don't process directories starting with . or _
-            dirs[:] = [item for item in dirs if not item.startswith(prefixes)]
+filterdir(root, name, entry) returns True for directories to skip, by default
+those starting with . or _.
+"""
 
-            url_prefix = os.path.relpath(root, start=prefix)
-
-            for basename in (item for item in files if whitelist(item)):
-                if not basename.endswith(extensions):
-                    continue
-                url = pathjoin(url_prefix, changeext(basename, 'html'))
-                filename = pathjoin(root, basename)
-
-                # construct the page
-                entry = Page(path=url, content=Content(filename))
-                self_render_pages.append(entry)
+    prefixes = ('.', '_')
+    extensions = ('.md', '.mkd', '.mdown', '.markdown')
 
-    return self_render_pages
+    def __init__(self, filterdir=None, jobs=32):
+        super().__init__()
+        self._filterdir = filterdir or (lambda root, name, entry=None:
+                                                name.startswith(self.prefixes))
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(jobs)
+        self._pending = {}
+        self._searches = []
+        self.directories = []
+
+
+    def search(self, include):
+        pages = []
+        tops = []
+        for name in expand_path(include):
+            canon = canonicpath(name)
+            prefix = os.path.basename(canon) if canon.startswith(('.','/')) else ''
+            tops.append((canon, prefix, {}))
+            self._submit(canon, tops[-1][2])
+        self._searches.append((pages, tops))
+        return pages
+
+
+    def finish(self):
+        """Wait for all scans to complete and fill the lists of pages"""
+        from concurrent.futures import wait, FIRST_COMPLETED
+        while self._pending:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                root, results = self._pending.pop(future)
+                results[root] = files, dirs = future.result()
+                self.directories.append(root)
+                for name in dirs:
+                    self._submit(os.path.join(root, name), results)
+        self._executor.shutdown()
+
+        for pages, tops in self._searches:
+            for top, prefix, results in tops:
+                stack = [top]
+                while stack:
+                    root = stack.pop()
+                    files, dirs = results[root]
+                    url_prefix = os.path.relpath(root, start=prefix)
+                    for basename in files:
+                        url = pathjoin(url_prefix, changeext(basename, 'html'))
+                        filename = pathjoin(root, basename)
+
+                        # construct the page
+                        pages.append(Page(path=url, content=Content(filename)))
+                    stack.extend(os.path.join(root, name) for name in reversed(dirs))
+        self._searches = []
+
+
+    def _submit(self, root, results):
+        self._pending[self._executor.submit(self._scan, root)] = (root, results)
+
+
+    def _scan(self, root):
+        """Return sorted lists of source files and subdirectories to search in root"""
+        files, dirs = [], []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # don't process directories starting with . or _ or ignored
+                        if not self._filterdir(root, entry.name, entry):
+                            dirs.append(entry.name)
+                    elif not entry.name.startswith(self.prefixes) \
+                            and entry.name.endswith(self.extensions) and entry.is_file():
+                        files.append(entry.name)
+        except OSError:
+            pass
+        return sorted(files), sorted(dirs)
@@ -0,0 +1,101 @@
+from datetime import date
+from .content import Content
+
+
+class Index(object):
+    """
+# Index(pages, group_by=('tags', 'categories'), sort_by='date', reverse=True)
+
+Indexes over the configured pages, built once per build so that templates
+need not scan every page to list tags, archives or recent posts.  Pages are
+sorted by the `sort_by` key, newest first unless `reverse` is false, and every
+page list in the index is in that order.
+
+Groups are made for each key in `group_by`; a page whose value for the key
+is a list is added to the group for each item.  Pages without the key, and
+values which cannot be used as a dictionary key, are skipped.
+
+The order depends on dates taken from content files' modification times, so
+reading `pages` or `groups` adds those files to Content.reads.
+
+Available to templates as `halcyon.index`, eg:
+
+```jinja
+{% for tag, pages in halcyon.index.tags.items() %}...{% endfor %}
+{% for page in halcyon.index.pages[:10] %}...{% endfor %}
+{{ halcyon.index.url['/about.html'].title }}
+```
+
+The following properties are supported:
+* `pages` --- All pages, sorted.
+* `groups` --- Mapping of each group_by key to a mapping of value to pages,
+  values in sorted order.  Groups are also available by key, as above.
+* `path` --- Mapping of output path to page.
+* `url` --- Mapping of URL to page.
+"""
+
+    def __init__(self, pages, group_by=('tags', 'categories'), sort_by='date',
+                 reverse=True):
+        super().__init__()
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        self._pages = sorted(pages, key=lambda page: _sort_key(page.get(sort_by)),
+                             reverse=bool(reverse))
+        self.path = {page['path']: page for page in self._pages if 'path' in page}
+        self.url = {page['url']: page for page in self._pages if 'url' in page}
+        self._dated = []
+        if sort_by == 'date':
+            self._dated = [page._dated for page in self._pages
+                                       if getattr(page, '_dated', None) is not None]
+
+        self._groups = {}
+        for key in group_by:
+            groups = {}
+            for page in self._pages:
+                values = page.get(key)
+                if values is None:
+                    continue
+                if not isinstance(values, (list, tuple)):
+                    values = [values]
+                for value in values:
+                    try:
+                        groups.setdefault(value, []).append(page)
+                    except TypeError:
+                        pass
+            self._groups[key] = {value: groups[value]
+                                     for value in sorted(groups, key=_sort_key)}
+
+
+    @property
+    def pages(self):
+        self._read()
+        return self._pages
+
+
+    @property
+    def groups(self):
+        self._read()
+        return self._groups
+
+
+    def __getitem__(self, key):
+        return self.groups[key]
+
+
+    def __contains__(self, key):
+        return key in self._groups
+
+
+    def _read(self):
+        if Content.reads is not None:
+            Content.reads.update(self._dated)
+
+
+def _sort_key(value):
+    """Key ordering dates and strings together, other values by their text.
+    Missing values sort first."""
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,100 @@
+import os
+import re
+from .content import Content
+from .markdown import Markdown
+from .utils import pathjoin
+
+# links with a scheme (http:, mailto:, ...) or network location are external
+_external = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*:|//)')
+
+
+class LinkMap(object):
+    """
+# LinkMap(pages, root, markdown_ext, assets)
+
+Map from the source file of each page to the page's URL, built once the pages
+are configured.  Links in Markdown content to other source files, relative to
+the file containing the link, are rewritten to the URL of the page rendered
+from the source, keeping any query or fragment.  Links to files matching
+markdown_ext which are not rendered are reported as broken.
+
+assets maps asset paths relative to the site root to fingerprinted paths, see
+Fingerprint(), for `url()`.
+
+Links are obtained from the Markdown render cache so unchanged content is not
+parsed again to find them.
+
+The following methods are supported:
+* `resolve(pages, release)` --- Rewrite links in the content of each page and
+  any Markdown values, return a list of (source, link) for broken links.  If
+  release is True each Content() is released as soon as its links are
+  rewritten, see Content.release().
+* `url(value)` --- URL for value, a page, source filename or path relative to
+  the site root, fingerprinted if value is an asset.
+"""
+
+    def __init__(self, pages, root='/', markdown_ext=None, assets=None):
+        super().__init__()
+        self._root = root
+        self._markdown_ext = markdown_ext
+        self._assets = assets if assets is not None else {}
+        self.sources = {}
+        for page in pages:
+            filename = getattr(page._content, 'filename', None)
+            if filename is not None and 'url' in page:
+                self.sources.setdefault(os.path.abspath(filename), page['url'])
+
+
+    def resolve(self, pages, release=False):
+        broken = []
+        seen = set()
+        for page in pages:
+            for value in page.values():
+                if isinstance(value, (Content, Markdown)) and id(value) not in seen:
+                    seen.add(id(value))
+                    broken.extend(self._update(value))
+                    if release and isinstance(value, Content):
+                        value.release()
+        return broken
+
+
+    def _update(self, content):
+        """Rewrite the links in content, return its broken links"""
+        from urllib.parse import urlsplit, urlunsplit
+        filename = getattr(content, 'filename', None)
+        source = filename or os.curdir
+        directory = os.path.dirname(os.path.abspath(filename)) if filename else os.getcwd()
+
+        linkmap = {}
+        broken = []
+        for link in content.links():
+            if not link or link.startswith('#') or _external.match(link):
+                continue
+            parts = urlsplit(link)
+            if not parts.path or parts.path.startswith('/'):
+                continue
+            target = os.path.normpath(os.path.join(directory, parts.path))
+            url = self.sources.get(target)
+            if url is not None:
+                linkmap[link] = urlunsplit(('', '', url, parts.query, parts.fragment))
+            elif self._markdown_ext and self._markdown_ext.match(parts.path):
+                broken.append((source, link))
+        if linkmap:
+            content.update_links(linkmap)
+        return broken
+
+
+    def url(self, value):
+        if isinstance(value, dict) and 'url' in value:
+            return value['url']
+        value = str(value)
+        if _external.match(value) or value.startswith('#'):
+            return value
+        url = self.sources.get(os.path.abspath(value))
+        if url is not None:
+            return url
+        asset = self._assets.get(os.path.normpath(value.lstrip('/')).replace(os.sep, '/'))
+        if asset is not None:
+            return pathjoin(self._root, asset)
+        url = pathjoin(self._root, value)
+        return url + '/' if value.endswith('/') and not url.endswith('/') else url
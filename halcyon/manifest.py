@@ -0,0 +1,183 @@
+import os
+import json
+import hashlib
+from datetime import date
+from .utils import file_digest
+from .markdown import Markdown
+
+
+class Manifest(dict):
+    """
+# Manifest(filename)
+
+Persistent build state.  The manifest is a dictionary loaded from a JSON file
+in the cache directory at the start of a build and saved at the end.  A
+missing or unreadable manifest is treated as empty so the next build is a full
+rebuild.
+
+The following keys are used:
+* `digests` --- Content digests of input files, see Digests().
+* `output_dir` --- Output directory used for the recorded pages.
+* `pages` --- Mapping of output path to the inputs used to render it.
+* `templates` --- Templates referenced by each template, see Dependencies().
+* `sass` --- Inputs used to compile each Sass entry point.
+"""
+
+    def __init__(self, filename):
+        super().__init__()
+        self._filename = filename
+        try:
+            with open(filename) as stream:
+                self.update(json.load(stream))
+        except (OSError, ValueError):
+            pass
+
+
+    def save(self):
+        """Atomically replace the manifest file"""
+        os.makedirs(os.path.dirname(self._filename) or os.curdir, exist_ok=True)
+        temp = self._filename + '.tmp'
+        with open(temp, 'w') as stream:
+            json.dump(self, stream, sort_keys=True)
+        os.replace(temp, self._filename)
+
+
+class Digests(object):
+    """
+# Digests(cache)
+
+Callable returning the content digest of a file or None if it does not exist.
+Digests are remembered in the cache dictionary (usually a manifest entry)
+alongside the file's size and modification time so that unchanged files are
+not re-read on later builds.  Only files looked up during this build are kept
+in `used` so the cache does not grow without bound.
+"""
+
+    def __init__(self, cache=None):
+        super().__init__()
+        self._cache = cache or {}
+        self.used = {}
+
+
+    def __call__(self, path):
+        entry = self.used.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        entry = entry or self._cache.get(path)
+        if not (entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size):
+            entry = [st.st_mtime_ns, st.st_size, file_digest(path)]
+        self.used[path] = entry
+        return entry[2]
+
+
+class Dependencies(object):
+    """
+# Dependencies(jinja_env, digests, references)
+
+Compute the input files for each page along with their digests.  A page
+depends on its content file and on every template reachable from its layout
+via extends, include and import.  If any template names its dependency with an
+expression, every template on the search path is a dependency.  Template
+dependencies are computed once per layout.
+
+The templates referenced by each template file are remembered in the
+references dictionary (usually a manifest entry) by the file's digest so that
+unchanged templates need not be parsed again.
+"""
+
+    def __init__(self, jinja_env, digests, references=None):
+        super().__init__()
+        self._env = jinja_env
+        self._digests = digests
+        self._templates = {}
+        self._references = references or {}
+        self.used = {}
+
+
+    def __call__(self, page):
+        depends = dict(self.templates(page._layout(self._env)))
+        for filename in page._depends():
+            depends[filename] = self._digests(filename)
+        return depends
+
+
+    def templates(self, name):
+        if name in self._templates:
+            return self._templates[name]
+
+        from jinja2 import TemplateNotFound
+
+        depends = {}
+        pending, seen = [name], set()
+        while pending:
+            item = pending.pop()
+            if item in seen:
+                continue
+            seen.add(item)
+            try:
+                filename, digest, refs = self._lookup(item)
+            except TemplateNotFound:
+                continue
+            depends[filename] = digest
+            if refs is None:
+                pending.extend(self._env.list_templates())
+            else:
+                pending.extend(refs)
+
+        self._templates[name] = depends
+        return depends
+
+
+    def _lookup(self, name):
+        """Return the filename, digest and referenced template names for the
+        template called name.  Referenced names are None if not known."""
+        from jinja2 import meta
+
+        source, filename, _ = self._env.loader.get_source(self._env, name)
+        digest = self._digests(filename)
+        entry = self._references.get(filename)
+        if not (entry and entry[0] == digest):
+            refs = list(meta.find_referenced_templates(self._env.parse(source)))
+            entry = [digest, None if None in refs else refs]
+        self.used[filename] = entry
+        return filename, digest, entry[1]
+
+
+def signature(value):
+    """Return a stable string representation of page metadata.
+
+    Pages are represented by their path so that references between pages
+    cannot recurse and Markdown by its full source text.
+    """
+    from .page import Page
+
+    if isinstance(value, Page):
+        return repr(value)
+    if isinstance(value, Markdown):
+        return value.source
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(signature(item) for item in value))
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join('{}: {}'.format(key, signature(value[key]))
+                                         for key in sorted(value, key=str)))
+    if isinstance(value, date):
+        return value.isoformat()
+    return repr(value)
+
+
+def site_digest(files, pages, digests):
+    """Digest of the inputs shared by all pages.
+
+    This covers the sitemap, the included configuration files and the
+    metadata of every page, since any template may refer to them.  The text
+    of content files is not included, templates which read it depend on the
+    files they read, see Content.reads.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    for filename in files:
+        hasher.update('{}\0{}\0'.format(filename, digests(filename)).encode())
+    for page in pages:
+        hasher.update(signature(page._shared()).encode())
+    return hasher.hexdigest()
@@ -1,14 +1,14 @@
-from hycmark import CMark
 from .utils import truncate_middle
+from .cache import CachedRender
 
 class Markdown(object):
     """
 # Markdown(text)
 
 The Markdown() constructor takes a single string argument which should be
-Markdown text.  The markdown content is transformed on demand.  The output
-format depends on what is provided by the underlying Markdown implementation.
-Currently only HTML is provided.
+Markdown text.  The markdown content is transformed on demand and the result
+cached, see CachedRender().  The output format depends on what is provided by
+the underlying Markdown implementation.  Currently only HTML is provided.
 
 This provides more limited capability than Content() and is intended for
 marking up short fragments of text provided from YaML or other content.
@@ -20,18 +20,17 @@ The following methods are supported:
 * `__str__()` --- The processed content of the Markdown file,
 """
 
+    __slots__ = ('_raw_content', '_md')
+
     def __init__(self, markdown):
         super().__init__()
         self._raw_content = str(markdown)
-        self._cm = CMark(self._raw_content)
-        self._content = None
+        self._md = CachedRender(self._raw_content)
 
 
     def __str__(self):
         """content is processed markdown text"""
-        if self._content is None:
-            self._render()
-        return self._content
+        return self._md.html()
 
 
     def __repr__(self):
@@ -43,12 +42,8 @@ The following methods are supported:
         return self._raw_content
 
     def links(self):
-        return self._cm.links()
+        return self._md.links()
 
 
     def update_links(self, linkmap):
-        return self._cm.update_links(linkmap)
-
-
-    def _render(self):
-        self._content = self._cm.render_html()
+        return self._md.update_links(linkmap)
@@ -0,0 +1,244 @@
+import os
+import re
+
+# Increase when a minifier's output changes so cached results are discarded.
+version = 3
+
+# Minifiers by file extension, see register().
+minifiers = {}
+
+
+def register(extension):
+    """Decorator registering a function minifying text for files with
+    extension.  The function takes and returns a str."""
+    def decorator(func):
+        minifiers[extension] = func
+        return func
+    return decorator
+
+
+class Minifier(object):
+    """
+# Minifier(config, cache)
+
+Post-process output files to reduce their size.  Each registered minifier,
+see register(), is applied to files with its extension; by default HTML
+whitespace is collapsed and comments are removed from CSS and JavaScript.
+Results are kept in cache, a DiskCache(), keyed by the input so unchanged
+files are not minified again.
+
+config is the `minify` sitemap setting: true to enable every minifier, or a
+mapping of extension to true or false, plus:
+* `sass` --- libsass output style, default `compressed` when minifying CSS.
+
+The following methods are supported:
+* `find(filename)` --- Return a function minifying the bytes of filename or
+  None if it is not minified.
+* `__call__(filename, data)` --- Return data (bytes) for filename minified.
+* `prune()` --- Evict old entries from the cache.
+* `sass_style` --- Output style for libsass or None for its default.
+* `settings` --- List of the settings, which change when output would.
+"""
+
+    def __init__(self, config, cache=None):
+        super().__init__()
+        if config is True:
+            config = {}
+        self._cache = cache
+        self._minifiers = {extension: func for extension, func in minifiers.items()
+                                           if config.get(extension, True)}
+        unknown = set(config) - set(minifiers) - {'sass'}
+        if unknown:
+            raise ValueError('minify: no minifier for {}'.format(', '.join(sorted(unknown))))
+        default = 'compressed' if 'css' in self._minifiers else None
+        self.sass_style = config.get('sass', default)
+        self.settings = [version, sorted(self._minifiers), self.sass_style]
+
+
+    def find(self, filename):
+        extension = os.path.splitext(filename)[1][1:].lower()
+        func = self._minifiers.get(extension)
+        if func is None:
+            return None
+        return lambda data: self._minify(extension, func, data)
+
+
+    def __call__(self, filename, data):
+        minify = self.find(filename)
+        return minify(data) if minify is not None else data
+
+
+    def prune(self):
+        if self._cache is not None:
+            self._cache.prune()
+
+
+    def _minify(self, extension, func, data):
+        key = None
+        if self._cache is not None:
+            key = self._cache.key('minify', version, extension,
+                                  func.__module__, func.__qualname__, data)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            return data
+        result = func(text).encode('utf-8')
+        if key is not None:
+            self._cache.put(key, result)
+        return result
+
+
+# Elements whose content is kept verbatim, comments and tags
+_html_raw = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>|<!--.*?-->|<[^>]*>)',
+                       re.DOTALL | re.IGNORECASE)
+_space = re.compile(r'\s+')
+
+@register('html')
+def minify_html(text):
+    """Collapse each run of whitespace in text between tags to a single space,
+    or newline if it contains one.  Tags, comments and the content of pre,
+    textarea, script and style elements are not changed."""
+    def collapse(match):
+        return '\n' if '\n' in match.group(0) else ' '
+
+    parts = []
+    position = 0
+    for match in _html_raw.finditer(text):
+        parts.append(_space.sub(collapse, text[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_space.sub(collapse, text[position:]))
+    return ''.join(parts)
+
+
+@register('css')
+def strip_css_comments(text):
+    """Remove comments from CSS, except those starting /*! which
+    conventionally hold licences.  Text is returned unchanged if it contains
+    an unterminated string or comment."""
+    return _strip_comments(text, line_comments=False, regexps=False)
+
+
+@register('js')
+def strip_js_comments(text):
+    """Remove comments from JavaScript, except those starting /*!.  Strings,
+    template literals and regular expression literals are skipped.  Where a /
+    could be division or start a regular expression and a comment marker
+    follows it on the line, the rest of the line is left unchanged.  Text is
+    returned unchanged if the scanner finds anything unterminated."""
+    return _strip_comments(text, line_comments=True, regexps=True)
+
+
+# characters after which a / starts a regular expression rather than division
+_regexp_before = set('(,=:[!&|?{};+-*%<>~^')
+# characters after which a / is usually division but may start a regular
+# expression, eg `if (x) /re/.test(s)`, with identifier characters
+_ambiguous_before = set(')]_$')
+_regexp_keywords = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of',
+                    'new', 'delete', 'void', 'throw', 'yield', 'await')
+
+def _strip_comments(text, line_comments, regexps):
+    out = []
+    index, start, length = 0, 0, len(text)
+    last = ''                       # last significant character copied
+    while index < length:
+        char = text[index]
+        if char in '\'"`':
+            end = _skip_string(text, index)
+            if end is None:
+                return text
+            index = end
+            last = char
+        elif text.startswith('/*', index):
+            end = text.find('*/', index + 2)
+            if end < 0:
+                return text
+            if text.startswith('/*!', index):
+                # licence comments are copied unchanged
+                index = end + 2
+                continue
+            out.append(text[start:index])
+            # keep tokens either side of the comment apart
+            out.append(' ')
+            index = start = end + 2
+        elif line_comments and text.startswith('//', index):
+            end = text.find('\n', index)
+            end = length if end < 0 else end
+            out.append(text[start:index])
+            index = start = end
+        elif regexps and char == '/' and _starts_regexp(text, index, last):
+            end = _skip_regexp(text, index)
+            if end is None:
+                return text
+            index = end
+            last = '/'
+        elif regexps and char == '/' and (last in _ambiguous_before or last.isalnum()):
+            end = text.find('\n', index)
+            end = length if end < 0 else end
+            line = text[index + 1:end]
+            if '//' in line or '/*' in line:
+                # the comment marker may be inside a regular expression, keep
+                # the line unless that would leave a string or comment open
+                if '`' in line or line.rstrip('\r').endswith('\\') \
+                        or line.rfind('/*') > line.rfind('*/'):
+                    return text
+                index = end
+                last = ')'
+            else:
+                index += 1
+                last = '/'
+        else:
+            if not char.isspace():
+                last = char
+            index += 1
+    out.append(text[start:])
+    return ''.join(out)
+
+
+def _skip_string(text, index):
+    """Return the index after the string starting at index, or None"""
+    quote = text[index]
+    index += 1
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        if char == '\n' and quote != '`':
+            return None
+        index += 1
+    return None
+
+
+def _starts_regexp(text, index, last):
+    if last == '' or last in _regexp_before:
+        return True
+    words = re.search(r'(\w+)\s*$', text[max(0, index - 16):index])
+    return bool(words) and words.group(1) in _regexp_keywords
+
+
+def _skip_regexp(text, index):
+    """Return the index after the regular expression literal starting at
+    index, or None"""
+    index += 1
+    in_class = False
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '\n':
+            return None
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            return index + 1
+        index += 1
+    return None
@@ -1,9 +1,8 @@
-import jinja2
 import re
 import os
-from collections import abc
+from collections import abc, OrderedDict
 from .content import Content
-from .utils import canonicpath, changeext, pathjoin
+from .utils import canonicpath, changeext, pathjoin, file_digest, write_if_changed
 
 
 class Page(dict):
@@ -36,13 +35,30 @@ ensures the following keys are available:
   from `content.filename`.
 * `url` --- derived from `path` and supplied site root (usually '/').
 
-The following methods are available to templates:
+The following methods are available to templates, both as attributes of
+any page, e.g. `page.next(list)`, and by name when rendering the page:
 
 * `previous(list)` --- Find the page preceding this one in list or None.
 * `next(list)` --- Find the page following this one in list or None.
 * `active(page)` --- True if the page is being rendered.
+
+A date taken from the content file's modification time changes whenever the
+file is edited, so it is not part of the metadata shared with every page's
+template, see `_shared()`.  Instead templates which read it depend on the
+file, see Content.reads.
+
+The class attribute `reconfigurable` is set when watching for changes so that
+configure() keeps the page's initial values for reconfigure().  Otherwise
+they are not kept, to save memory.
     """
 
+    __slots__ = ('_output_dir', '_content', '_initial', '_dated')
+
+    # names of methods passed to the page's template by render()
+    _methods = ('previous', 'next', 'active')
+
+    reconfigurable = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._output_dir = os.curdir
@@ -51,77 +67,172 @@ The following methods are available to templates:
             if 'path' not in self:
                 self['path'] = changeext(content.filename, 'html')
         self._content = content
+        self._initial = None
+        self._dated = None
 
 
     def __repr__(self):
         return '<class Page({})>'.format(self.get('path',''))
 
 
+    def __getitem__(self, key):
+        if key == 'date' and self._dated is not None and Content.reads is not None:
+            Content.reads.add(self._dated)
+        return super().__getitem__(key)
+
+
     def configure(self, root):
         """configure the page in a pass prior to rendering so that templates
         can access metadata for all pages rather than just the current page"""
 
+        if Page.reconfigurable and self._initial is None:
+            self._initial = dict(self)
+
         # Jekyll compatibility, sort of. Merge frontmatter.
         if isinstance(self._content, (dict, abc.Mapping)):
             self.update(self._content)
 
         if 'title' not in self:
             self['title'] = getattr(self._content, 'heading', None)
+        self._dated = None
         if 'date' not in self:
             self['date'] = getattr(self._content, 'date', None)
+            if self['date'] is not None:
+                self._dated = getattr(self._content, 'filename', None)
 
         # Make sure URL is set. NB 'path' is required
         if 'url' not in self:
             path = self['path']
             self['url'] = pathjoin(root, path)
 
-        # Hack to ensure methods visible to Jinja, here so cannot be overwritten
-        page = {'previous': self._previous,
-                'next': self._next,
-                'active': self._active}
-        self.update(page)
 
+    def reconfigure(self, root):
+        """discard values merged by configure() and configure again"""
+        if self._initial is None:
+            raise ValueError('{!r} was configured without Page.reconfigurable'.format(self))
+        self.clear()
+        self.update(self._initial)
+        self.configure(root)
 
-    def render(self, output_dir, jinja_env):
-        """render the page to output_dir, using jinja_env"""
 
-        path = self['path']
-        print("Processing page:       {path}".format(path=path))
+    def release(self):
+        """release the content's text and rendering state, see Content.release()"""
+        if isinstance(self._content, Content):
+            self._content.release()
 
-        filename = os.path.join(output_dir, path)
 
-        # ensure directory exists
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    def _shared(self):
+        """metadata which may be used by any page's template, less a date
+        taken from the content file's modification time"""
+        shared = dict(self)
+        if self._dated is not None:
+            del shared['date']
+        return shared
 
-        # get the page theme and render output
-        # Note that properties and methods on this and other classes
-        # are called via the templates.
+
+    def _layout(self, jinja_env):
+        """name of the template used to render the page"""
         layout = self.get('layout', jinja_env.globals.get('layout', 'default'))
         if not layout.endswith('.html'):
             layout += '.html'
-        template = jinja_env.get_template(layout)
-        with open(filename, 'w') as stream:
-            for chunk in template.generate(self):
-                stream.write(chunk)
+        return layout
+
 
+    def _depends(self):
+        """list of source files the page is rendered from"""
+        filename = getattr(self._content, 'filename', None)
+        return [filename] if filename else []
 
-    def _active(self, page):
+
+    def render(self, output_dir, jinja_env, digests=file_digest, compress=None,
+               minify=None):
+        """render the page to output_dir, using jinja_env.  The file is only
+        written if its content changed, digests is used to obtain the digest
+        of the existing file.  If minify is given it is called with the
+        filename and content and returns the content to write, see Minifier().
+        If compress is given it is called with the filename and content.
+        Return True if the file was written."""
+
+        filename = os.path.join(output_dir, self['path'])
+
+        # ensure directory exists
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # get the page theme and render output
+        # Note that properties and methods on this and other classes
+        # are called via the templates.
+        # Methods are passed with the page so they cannot be overwritten.
+        template = jinja_env.get_template(self._layout(jinja_env))
+        methods = {name: getattr(self, name) for name in self._methods}
+        data = ''.join(template.generate(self, **methods)).encode('utf-8')
+        if minify is not None:
+            data = minify(filename, data)
+        changed = write_if_changed(filename, data, digests)
+        if compress is not None:
+            compress(filename, data)
+        return changed
+
+
+    def active(self, page):
         return page is self
 
 
-    def _previous(self, sequence):
+    def previous(self, sequence):
         """If this page is a member of sequence, return the previous page, else None."""
-        try:
-            index = sequence.index(self)
-        except:
-            return None
-        return sequence[index - 1] if index > 0 else None
+        index = _position(sequence, self)
+        return sequence[index - 1] if index else None
 
 
-    def _next(self, sequence):
+    def next(self, sequence):
         """If this page is a member of sequence, return the next page, else None."""
-        try:
-            index = sequence.index(self)
-        except:
+        index = _position(sequence, self)
+        if index is None or index >= len(sequence) - 1:
             return None
-        return sequence[index + 1] if index < len(sequence) - 1 else None
+        return sequence[index + 1]
+
+
+# Position indexes for sequences searched by previous() and next(), least
+# recently used first.  Each entry holds the sequence so that its id cannot be
+# reused while cached, its length and a mapping from item id to position.
+_indexes = OrderedDict()
+_max_indexes = 64
+
+def _position(sequence, item):
+    """Return the position of item in sequence by identity, or None.
+
+    The index for a sequence is built on first use and shared by all pages,
+    so walking a sequence with previous() and next() is linear rather than
+    quadratic.  The index is rebuilt if the sequence changes length or no
+    longer holds item at the indexed position.  An item not indexed is not
+    searched for: sequences only change between builds, before which the
+    indexes are discarded, see clear_indexes().
+    """
+    try:
+        entry = _indexes.get(id(sequence))
+        if entry is None or entry[0] is not sequence or entry[1] != len(sequence):
+            entry = _index(sequence)
+        else:
+            _indexes.move_to_end(id(sequence))
+        index = entry[2].get(id(item))
+        if index is not None and sequence[index] is not item:
+            index = _index(sequence)[2].get(id(item))
+    except TypeError:
+        return None
+    return index
+
+
+def clear_indexes():
+    """Discard the position indexes, the sequences may have changed"""
+    _indexes.clear()
+
+
+def _index(sequence):
+    positions = {}
+    for index, item in enumerate(sequence):
+        positions.setdefault(id(item), index)
+    entry = (sequence, len(sequence), positions)
+    _indexes[id(sequence)] = entry
+    _indexes.move_to_end(id(sequence))
+    while len(_indexes) > _max_indexes:
+        _indexes.popitem(last=False)
+    return entry
@@ -0,0 +1,157 @@
+import re
+from .page import Page
+from .utils import pathjoin
+
+
+class Pagination(list):
+    """
+# Pagination(options)
+
+A list of pages generated by splitting a sequence into pages of `per_page`
+items, created with the `!paginate` sitemap tag.  eg:
+
+```yaml
+posts: &posts !search posts
+blog: !paginate
+  items: *posts
+  per_page: 10
+  path: blog/page{number}.html
+  first: blog/index.html
+  layout: list
+tags: !paginate
+  group: tags
+  per_page: 20
+  path: tags/{slug}/page{number}.html
+  first: tags/{slug}/index.html
+  layout: tag
+```
+
+Options are:
+* `items` --- Sequence of items, usually pages, to paginate.  Refer to pages
+  found elsewhere in the sitemap with an alias, as above, since a second
+  `!search` would create the pages again.
+* `group` --- Instead of items, paginate each group of halcyon.index for this
+  key separately, see Index().
+* `per_page` --- Items per page, default 10.
+* `path` --- Output path pattern, formatted with `number` (from 1) and for
+  groups `value` and `slug`, the value made safe for a path.
+* `first` --- Optional path pattern for the first page.
+Other options are copied into every generated page, for example `layout`.
+
+The pages are generated by `expand()` once the sitemap's pages are configured
+and the index is built.  Each has a `paginator`, see Paginator().
+"""
+
+    # options which are not copied into the generated pages
+    _keys = ('items', 'group', 'per_page', 'path', 'first')
+
+    def __init__(self, options):
+        super().__init__()
+        if 'path' not in options:
+            raise ValueError('!paginate requires a path')
+        if ('items' in options) == ('group' in options):
+            raise ValueError('!paginate requires one of items or group')
+        self._options = options
+
+
+    def __repr__(self):
+        return '<class Pagination({})>'.format(self._options['path'])
+
+
+    def expand(self, index, root):
+        """Generate and configure the pages, return them"""
+        options = self._options
+        per_page = max(1, int(options.get('per_page', 10)))
+        values = {key: value for key, value in options.items()
+                             if key not in self._keys}
+        if 'group' in options:
+            if options['group'] not in index:
+                raise ValueError('!paginate group {} is not in index group_by'
+                                 .format(options['group']))
+            series = [(value, items, dict(value=value, slug=slugify(value)))
+                      for value, items in index[options['group']].items()]
+        else:
+            series = [(None, list(options['items'] or []), {})]
+
+        self.clear()
+        for value, items, names in series:
+            count = max(1, (len(items) + per_page - 1) // per_page)
+            paths = [self._path(number, names) for number in range(1, count + 1)]
+            urls = [pathjoin(root, path) for path in paths]
+            for number, path in enumerate(paths, 1):
+                start = (number - 1) * per_page
+                paginator = Paginator(items[start:start + per_page], number, urls,
+                                      value, len(items))
+                page = Page(values, path=path, paginator=paginator)
+                page.configure(root)
+                self.append(page)
+        return list(self)
+
+
+    def _path(self, number, names):
+        if number == 1 and 'first' in self._options:
+            return self._options['first'].format(number=number, **names)
+        return self._options['path'].format(number=number, **names)
+
+
+class Paginator(object):
+    """
+# Paginator(items, page, urls, value, total)
+
+The slice of items for one generated page and links to the others, available
+to its template as `paginator`.
+
+The following properties are supported:
+* `items` --- Items on this page.
+* `page` --- Page number, from 1.
+* `pages` --- Number of pages.
+* `total` --- Number of items on all pages.
+* `value` --- Group value, or None.
+* `urls` --- URLs of every page, in order.
+* `first_url`, `last_url` --- URLs of the first and last pages.
+* `previous_url`, `next_url` --- URLs of the adjacent pages or None.
+"""
+
+    __slots__ = ('items', 'page', 'urls', 'value', 'total')
+
+    def __init__(self, items, page, urls, value=None, total=0):
+        self.items = items
+        self.page = page
+        self.urls = urls
+        self.value = value
+        self.total = total
+
+
+    def __repr__(self):
+        return '<class Paginator({}/{} {!r})>'.format(self.page, self.pages, self.items)
+
+
+    @property
+    def pages(self):
+        return len(self.urls)
+
+
+    @property
+    def first_url(self):
+        return self.urls[0]
+
+
+    @property
+    def last_url(self):
+        return self.urls[-1]
+
+
+    @property
+    def previous_url(self):
+        return self.urls[self.page - 2] if self.page > 1 else None
+
+
+    @property
+    def next_url(self):
+        return self.urls[self.page] if self.page < len(self.urls) else None
+
+
+def slugify(value):
+    """Lower case value with runs of characters other than letters and digits
+    replaced by '-'"""
+    return re.sub(r'[^\w]+', '-', str(value).lower()).strip('-') or '-'
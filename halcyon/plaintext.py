@@ -1,5 +1,6 @@
 import os
 from datetime import datetime
+from .content import Content
 
 class Plaintext(object):
     """
@@ -17,9 +18,16 @@ The following properties are supported:
 * `date` --- Source file modification time.
 """
 
+    __slots__ = ('_filename', '_content', '_date')
+
     def __init__(self, filename):
         super().__init__()
         self._filename = filename
+        self.reload()
+
+
+    def reload(self):
+        """Discard content read from the file so it is read again on demand"""
         self._content = None
         self._date = None
 
@@ -29,6 +37,7 @@ The following properties are supported:
 
 
     def __str__(self):
+        self._read()
         if self._content is None:
             self._include()
         return self._content
@@ -41,12 +50,19 @@ The following properties are supported:
 
     @property
     def date(self):
+        self._read()
         if self._date is None:
             mtime = os.path.getmtime(self._filename)
             self._date = datetime.fromtimestamp(mtime).isoformat()
         return self._date
 
 
+    def _read(self):
+        """note that the file was used, see Content.reads"""
+        if Content.reads is not None:
+            Content.reads.add(self._filename)
+
+
     def _include(self):
         """ Include pathname at current node."""
 
@@ -0,0 +1,96 @@
+import time
+import json
+from datetime import datetime
+from contextlib import contextmanager
+
+# The active Profile, if any.  Timing is a no-op when this is None.
+current = None
+
+
+class Profile(object):
+    """
+# Profile()
+
+Collect build timings.  Phases are timed with the `phase()` context manager
+and accumulate, so nested or repeated phases such as Markdown rendering
+within template rendering may be measured separately.  Each rendered page is
+recorded with `page()`.
+
+The following methods are supported:
+* `report(top)` --- Return the timings as a dictionary suitable for JSON,
+  listing the top slowest pages and templates.
+* `write(filename)` --- Write the report as JSON to filename or stdout if '-'.
+"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = datetime.now().isoformat()
+        self.phases = {}
+        self.pages = []
+
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+    def page(self, path, layout, total, markdown):
+        self.pages.append(dict(path=path, layout=layout, total=total,
+                               markdown=markdown, template=total - markdown))
+
+
+    def report(self, top=20):
+        templates = {}
+        for page in self.pages:
+            entry = templates.setdefault(page['layout'], dict(layout=page['layout'], count=0,
+                                                             total=0.0, markdown=0.0,
+                                                             template=0.0))
+            entry['count'] += 1
+            for key in ('total', 'markdown', 'template'):
+                entry[key] += page[key]
+
+        def slowest(items):
+            return sorted(items, key=lambda item: item['total'], reverse=True)[:top]
+
+        return dict(started=self.started,
+                    phases=self.phases,
+                    pages=dict(count=len(self.pages),
+                               total=sum(page['total'] for page in self.pages),
+                               markdown=sum(page['markdown'] for page in self.pages),
+                               template=sum(page['template'] for page in self.pages)),
+                    slowest_pages=slowest(self.pages),
+                    slowest_templates=slowest(templates.values()))
+
+
+    def write(self, filename):
+        report = json.dumps(self.report(), indent=2)
+        if filename == '-':
+            print(report)
+        else:
+            with open(filename, 'w') as stream:
+                stream.write(report)
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed code and add it to the named phase"""
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, time.perf_counter() - start)
+
+
+def timed(name, func):
+    """Wrap func so time spent in it is added to the named phase"""
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def elapsed(name):
+    """Total time recorded so far for the named phase"""
+    return current.phases.get(name, 0.0) if current is not None else 0.0
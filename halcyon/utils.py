@@ -1,4 +1,5 @@
 import re, os
+import hashlib
 
 def rootname():
     cre = re.compile(r'\W+')
@@ -29,11 +30,93 @@ def canonicpath(path):
     return os.path.normpath(os.path.expanduser(path))
 
 
+class DirFilter(object):
+    """Directory filter for walking trees.
+
+    Calling the filter with root, name and optionally the os.scandir() entry
+    for root/name returns True if name starts with . or _ or the directory is
+    the same file as any directory added to the filter.  Added directories are
+    resolved once to (device, inode) pairs so each test is a set lookup
+    rather than a samefile() call per ignored directory.  Directories which
+    do not exist when added are not ignored.
+    """
+
+    def __init__(self, dirs=()):
+        super().__init__()
+        self._inodes = set()
+        self._ino = set()
+        self.update(dirs)
+
+
+    def update(self, dirs):
+        for item in dirs:
+            try:
+                st = os.stat(item)
+            except OSError:
+                continue
+            self._inodes.add((st.st_dev, st.st_ino))
+            self._ino.add(st.st_ino)
+
+
+    def __call__(self, root, name, entry=None):
+        if name.startswith(('.', '_')):
+            return True
+        try:
+            # the inode number from a scandir entry is free, stat only on a match
+            if entry is not None:
+                if entry.inode() not in self._ino:
+                    return False
+                st = entry.stat()
+            else:
+                st = os.stat(os.path.join(root, name))
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino) in self._inodes
+
+
 def newer(path1, path2):
     """Test of path1 is newer than path2"""
     return os.path.getmtime(path1) > os.path.getmtime(path2)
 
 
+def digest(data):
+    """Return the hex digest of data (bytes)"""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def file_digest(path):
+    """Return the hex digest of the contents of path"""
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as stream:
+        for block in iter(lambda: stream.read(65536), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def write_if_changed(filename, data, digests=file_digest):
+    """Write data (bytes) to filename unless the file already has the same
+    content.  The file is replaced atomically via a temporary file in the same
+    directory.  Return True if the file was written.
+    """
+    try:
+        if digests(filename) == digest(data):
+            return False
+    except OSError:
+        pass
+
+    dirname, basename = os.path.split(filename)
+    temp = os.path.join(dirname, '.{}.{}.tmp'.format(basename, os.getpid()))
+    try:
+        with open(temp, 'wb') as stream:
+            stream.write(data)
+        os.replace(temp, filename)
+    except:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return True
+
+
 def normalize_space(text):
     return ' '.join(text.split())
 
@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import select
+import struct
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+class Watcher(object):
+    """
+# Watcher(paths, ignore)
+
+Watch the directory trees listed in paths for changes.  Directories starting
+with '.' and those listed in ignore are not watched.  On Linux changes are
+reported by inotify, elsewhere the trees are polled.
+
+The following methods are supported:
+* `wait()` --- Block until files change and return the set of changed
+  pathnames.  The set contains None if changes were lost.
+* `close()` --- Stop watching.
+"""
+
+    def __new__(cls, *args, **kwargs):
+        if cls is Watcher:
+            cls = InotifyWatcher if sys.platform.startswith('linux') else PollWatcher
+        return super().__new__(cls)
+
+
+    def __init__(self, paths, ignore=()):
+        super().__init__()
+        self._ignore = {os.path.abspath(path) for path in ignore}
+        self._paths = [os.path.abspath(path) for path in paths]
+        self._paths = [path for index, path in enumerate(self._paths)
+                            if path not in self._paths[:index] and os.path.isdir(path)]
+
+
+    def walk(self, path):
+        """Return the list of directories to watch below and including path"""
+        dirs = []
+        for root, subdirs, _ in os.walk(path, followlinks=True):
+            if root in self._ignore:
+                subdirs[:] = []
+                continue
+            dirs.append(root)
+            subdirs[:] = [item for item in subdirs if not item.startswith('.')]
+        return dirs
+
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(Watcher):
+
+    IN_ATTRIB      = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_IGNORED     = 0x00008000
+    IN_ISDIR       = 0x40000000
+
+    MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO \
+                     | IN_CREATE | IN_DELETE
+
+    def __init__(self, paths, ignore=()):
+        super().__init__(paths, ignore)
+        import ctypes, ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self._watches = {}
+        for path in self._paths:
+            for directory in self.walk(path):
+                self._add_watch(directory)
+
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+
+
+    def wait(self, delay=0.1):
+        changed = set()
+        select.select([self._fd], [], [])
+        # collect further events until things settle
+        while select.select([self._fd], [], [], delay)[0]:
+            data = os.read(self._fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+                offset += struct.calcsize('iIII')
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    changed.add(None)
+                    continue
+                if mask & self.IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                pathname = os.path.join(directory, name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        for item in self.walk(pathname):
+                            self._add_watch(item)
+                        changed.update(os.path.join(root, item)
+                                       for root, _, files in os.walk(pathname)
+                                       for item in files)
+                    continue
+                if not name.startswith('.'):
+                    changed.add(pathname)
+        return changed
+
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollWatcher(Watcher):
+
+    def __init__(self, paths, ignore=()):
+        super().__init__(paths, ignore)
+        self._snapshot = self.scan()
+
+
+    def scan(self):
+        snapshot = {}
+        for path in self._paths:
+            for directory in self.walk(path):
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.') or not entry.is_file():
+                            continue
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+
+    def wait(self, interval=1.0):
+        while True:
+            time.sleep(interval)
+            snapshot = self.scan()
+            changed = {path for path in set(snapshot) | set(self._snapshot)
+                            if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+
+def watch(factory, sitemap=None, server=None):
+    """Build the site and rebuild it when sources change until interrupted.
+
+    factory() returns a new Halcyon instance, used for the initial build and
+    whenever the site must be rebuilt from the sitemap.  Otherwise the same
+    instance is updated so the parsed sitemap, content and Jinja environment
+    stay in memory.  If server is a (bind, port) tuple the output directory is
+    also served over HTTP.
+    """
+    from .page import Page
+    Page.reconfigurable = True
+
+    prog = factory()
+    prog(sitemap)
+    if server is not None:
+        serve(prog._output_dir, *server)
+
+    watcher = Watcher(*prog.watch_paths())
+    try:
+        while True:
+            print("Watching for changes (^C to exit)")
+            changed = watcher.wait()
+            start = time.monotonic()
+            if not prog.update(changed):
+                watcher.close()
+                prog = factory()
+                prog(sitemap)
+                watcher = Watcher(*prog.watch_paths())
+            print("Rebuilt in {:.3f}s".format(time.monotonic() - start))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+class _RequestHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, bind='127.0.0.1', port=8000):
+    """Serve directory over HTTP from a background thread"""
+    handler = functools.partial(_RequestHandler, directory=directory)
+    server = ThreadingHTTPServer((bind, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print("Serving:               http://{bind}:{port}/".format(bind=bind, port=port))
+    return server
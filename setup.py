@@ -17,13 +17,13 @@ setup(
     install_requires=[
         'pyyaml',
         'hycmark',
-        'jinja2',
+        'jinja2>=3.0',
     ],
+    python_requires='>=3.8',
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License (GPL)",
         "Operating System :: OS Independent",
     ],
     scripts=['scripts/halcyon'],
-    python_requires='>=3.6',
 )
@@ -0,0 +1,85 @@
+import unittest
+from halcyon.minify import Minifier, minify_html, strip_css_comments, strip_js_comments
+
+
+class TestCSS(unittest.TestCase):
+
+    def test_comments(self):
+        self.assertEqual(strip_css_comments('a { color: red; /* note */ }\n/* x */b {}'),
+                         'a { color: red;   }\n b {}')
+
+    def test_licence(self):
+        text = '/*! licence */\na {}'
+        self.assertEqual(strip_css_comments(text), text)
+
+    def test_strings(self):
+        text = 'a { content: "/* not a comment */"; background: url(\'//host/x.png\'); }'
+        self.assertEqual(strip_css_comments(text), text)
+
+    def test_unterminated(self):
+        text = 'a {} /* open'
+        self.assertEqual(strip_css_comments(text), text)
+
+
+class TestJS(unittest.TestCase):
+
+    def test_comments(self):
+        self.assertEqual(strip_js_comments('var a = 1; // one\n/* two */var b = 2;'),
+                         'var a = 1; \n var b = 2;')
+
+    def test_licence(self):
+        text = '/*! licence */\nvar a;'
+        self.assertEqual(strip_js_comments(text), text)
+
+    def test_strings(self):
+        text = 'var a = "//", b = \'/*\', c = `\n// ${a}\n`;'
+        self.assertEqual(strip_js_comments(text), text)
+
+    def test_regexp(self):
+        self.assertEqual(strip_js_comments('var re = /\\/\\//g; // c'),
+                         'var re = /\\/\\//g; ')
+        self.assertEqual(strip_js_comments('return /[/]/.test(s); // c'),
+                         'return /[/]/.test(s); ')
+
+    def test_division(self):
+        self.assertEqual(strip_js_comments('var a = b / c;\n// c\n'),
+                         'var a = b / c;\n\n')
+
+    def test_ambiguous(self):
+        # after ) a / may start a regular expression or divide
+        text = 'if (ok) /\\/\\//.test(s); // c\nvar a; // d'
+        self.assertEqual(strip_js_comments(text),
+                         'if (ok) /\\/\\//.test(s); // c\nvar a; ')
+        text = 'var a = b / c; /* open\n*/'
+        self.assertEqual(strip_js_comments(text), text)
+
+    def test_unterminated(self):
+        text = 'var a = "open\n// c'
+        self.assertEqual(strip_js_comments(text), text)
+
+
+class TestHTML(unittest.TestCase):
+
+    def test_whitespace(self):
+        self.assertEqual(minify_html('<p>a   b\n\n  c</p>  <p>d</p>'),
+                         '<p>a b\nc</p> <p>d</p>')
+
+    def test_raw(self):
+        text = ('<pre>a   b\n  c</pre><textarea>  x  </textarea>'
+                '<script>var a  =  1;</script><style>a  {}</style><!--  c  -->')
+        self.assertEqual(minify_html(text), text)
+
+
+class TestMinifier(unittest.TestCase):
+
+    def test_config(self):
+        minifier = Minifier({'js': False})
+        self.assertIsNone(minifier.find('a.js'))
+        self.assertEqual(minifier('a.css', b'a {/* c */}'), b'a { }')
+        self.assertEqual(minifier.sass_style, 'compressed')
+        with self.assertRaises(ValueError):
+            Minifier({'xml': True})
+
+
+if __name__ == '__main__':
+    unittest.main()